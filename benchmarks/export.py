@@ -0,0 +1,103 @@
+# Compare the bulk worksheet export against the original column by column from_list export,
+# using the originpro stand-in of benchmarks/fake_originpro.py.
+#
+# The consolidated layouts (wide / long, with and without cycle decimation) are timed as well.
+#
+# usage: python -m benchmarks.export [--cycles N] [--points POINTS_PER_HALF_CYCLE]
+
+import argparse
+import time
+
+import numpy as np
+import pandas
+
+from benchmarks import fake_originpro, legacy
+from pylabhelper import biologic
+from pylabhelper.BiologicFile import BiologicFile
+
+
+def synthetic_modulo_bat(cycles, points, seed=0):
+    # galvanostatic charge / discharge between 0 and 1 V at 1 mA, one row per second
+    rng = np.random.default_rng(seed)
+    half_cycles = 2 * cycles
+    rows = half_cycles * points
+
+    half_cycle = np.repeat(np.arange(half_cycles), points)
+    ramp = np.tile(np.linspace(0, 1, points), half_cycles)
+    charging = half_cycle % 2 == 0
+    full_cell = np.where(charging, ramp, 1 - ramp) + rng.normal(0, 0.001, rows)
+
+    data = pandas.DataFrame({
+        'time/s': np.arange(rows, dtype=np.float64),
+        'Ewe/V': full_cell / 2,
+        'Ece/V': -full_cell / 2,
+        'Ewe-Ece/V': full_cell,
+        'I/mA': np.where(charging, 1.0, -1.0),
+        'cycle_number': (half_cycle // 2).astype(np.float64),
+        'half_cycle': half_cycle.astype(np.float64),
+    })
+    header = {'file_type': 'Modulo Bat', 'technique': pandas.DataFrame({1: ['1,000']}, index=['ctrl1_val'])}
+
+    file = BiologicFile.from_data(header, data)
+    # the sheets export the cycles of the cropped data
+    file.resolution_crop(delta_time=10, delta_pot=0.01)
+    file.extract_cycles()
+    file.calculate_charge_discharge_capacitances()
+    return file
+
+
+def sheet_contents(book):
+    return [sheet.content() for sheet in book.sheets[1:]]
+
+
+def same_contents(a, b):
+    return all(len(x) == len(y) and all(
+        cx[0] == cy[0] and cx[2:] == cy[2:] and np.array_equal(cx[1], cy[1], equal_nan=True)
+        for cx, cy in zip(x, y)) for x, y in zip(a, b)) and len(a) == len(b)
+
+
+def compare_sheets(file):
+    """Export the sheets of file with the original and the bulk path, returns both times, the sheet count and
+    whether the sheet contents are identical."""
+    biologic.op = fake_originpro
+
+    fake_originpro.reset()
+    start = time.perf_counter()
+    legacy_book = legacy.op_mb_charge_discharge_sheets(fake_originpro, file, 'benchmark', 'bench')
+    legacy_time = time.perf_counter() - start
+
+    fake_originpro.reset()
+    start = time.perf_counter()
+    biologic.op_mb_charge_discharge_data_to_workbook(file, 'benchmark', 'bench')
+    bulk_time = time.perf_counter() - start
+    bulk_book = fake_originpro.books[0]
+
+    identical = same_contents(sheet_contents(legacy_book), sheet_contents(bulk_book))
+    return legacy_time, bulk_time, len(bulk_book.sheets) - 1, identical
+
+
+def main(cycles, points):
+    file = synthetic_modulo_bat(cycles, points)
+    legacy_time, bulk_time, sheets, identical = compare_sheets(file)
+
+    print(f"{cycles} cycles x {2 * points} rows ({len(file.data)} rows, {sheets} sheets)")
+    print(f"  from_list  {legacy_time:8.3f} s")
+    print(f"  bulk       {bulk_time:8.3f} s")
+    print(f"  speedup    {legacy_time / bulk_time:8.1f} x  identical: {identical}")
+
+    for layout in ['wide', 'long']:
+        for decimation in [None, {'ends': 5, 'logarithmic': 20}]:
+            fake_originpro.reset()
+            start = time.perf_counter()
+            biologic.op_mb_charge_discharge_data_to_workbook(file, 'benchmark', 'bench', layout, decimation)
+            layout_time = time.perf_counter() - start
+            plots = len(fake_originpro.graphs[-1][0].plots)
+            print(f"  {layout:<5}      {layout_time:8.3f} s  {plots} stacked plots, decimation {decimation}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cycles', type=int, default=500)
+    parser.add_argument('--points', type=int, default=200)
+    arguments = parser.parse_args()
+    main(arguments.cycles, arguments.points)
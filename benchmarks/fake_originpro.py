@@ -0,0 +1,121 @@
+# Minimal stand-in for the parts of originpro used by the exporters.
+#
+# Worksheets keep their columns as numpy arrays and their labels as lists, so the cost of moving
+# data into a sheet can be measured (and the written content compared) without Origin installed.
+
+import numpy as np
+
+
+class Worksheet:
+    def __init__(self, name):
+        self.name = name
+        self.columns = {}
+        self.labels = {'L': {}, 'U': {}, 'C': {}}
+        self.designations = {}
+
+    def from_list(self, col, data, lname='', units='', comments='', axis='', start=0):
+        self.columns[col] = np.asarray(data, dtype=np.float64)
+        self.labels['L'][col] = lname
+        self.labels['U'][col] = units
+        self.labels['C'][col] = comments
+        self.designations[col] = axis
+
+    def from_df(self, df, c1=0, head=''):
+        for offset, column in enumerate(df.columns):
+            self.columns[c1 + offset] = np.array(df[column].to_numpy())
+            self.labels['L'][c1 + offset] = str(column)
+
+    def set_labels(self, labels, type='L', offset=0):
+        for index, label in enumerate(labels):
+            self.labels[type][offset + index] = label
+
+    def cols_axis(self, value, c1=0, c2=-1, repeat=True):
+        for index, designation in enumerate(value):
+            self.designations[c1 + index] = designation.upper()
+
+    def destroy(self):
+        pass
+
+    def content(self):
+        # (column, values, long name, units, comments, designation) of every written column
+        return [(col, self.columns[col], self.labels['L'].get(col, ''), self.labels['U'].get(col, ''),
+                 self.labels['C'].get(col, ''), self.designations.get(col, ''))
+                for col in sorted(self.columns)]
+
+
+class WorkBook:
+    def __init__(self):
+        self.name = ''
+        self.lname = ''
+        self.sheets = [Worksheet('Sheet1')]
+
+    def add_sheet(self, name=''):
+        sheet = Worksheet(name)
+        self.sheets.append(sheet)
+        return sheet
+
+    def __getitem__(self, index):
+        return self.sheets[index]
+
+
+class Plot:
+    def __init__(self, sheet, coly, colx, type):
+        self.sheet = sheet
+        self.coly = coly
+        self.colx = colx
+        self.type = type
+        self.commands = []
+
+    def set_cmd(self, *args):
+        self.commands.extend(args)
+
+
+class GraphLayer:
+    def __init__(self):
+        self.plots = []
+
+    def add_plot(self, obj, coly=1, colx=0, type='line', **kwargs):
+        plot = Plot(obj, coly, colx, type)
+        self.plots.append(plot)
+        return plot
+
+    def group(self, group=True, begin=-1, end=-1):
+        pass
+
+    def rescale(self):
+        pass
+
+
+class Graph:
+    def __init__(self, template):
+        self.template = template
+        self.name = ''
+        self.lname = ''
+        self.layers = [GraphLayer()]
+
+    def set_int(self, name, value):
+        pass
+
+    def __getitem__(self, index):
+        return self.layers[index]
+
+
+books = []
+graphs = []
+
+
+def new_book(type='w', lname='', template='', hidden=False):
+    book = WorkBook()
+    books.append(book)
+    return book
+
+
+def new_graph(lname='', template='', hidden=False):
+    graph = Graph(template)
+    graphs.append(graph)
+    return graph
+
+
+def reset():
+    books.clear()
+    graphs.clear()
@@ -0,0 +1,105 @@
+# Golden outputs of the synthetic benchmark files, computed with the reference implementations of benchmarks.legacy.
+#
+# usage: python -m benchmarks.golden [--sizes CYCLES ...]
+#
+# benchmarks/golden/{cycles}.npz holds the rows kept by the original resolution_crop (Modulo Bat and OCV), the
+# capacitances of the original half cycle code, the vertices found by the original find_peaks extraction of every
+# CV speed and the ring current of the RRDE file. None of it is produced by the code under test, so the suite and
+# tests/test_benchmarks.py check the optimized paths against the original results. The original resolution_crop
+# is quadratic, regenerating the 50 cycle snapshot takes about half a minute.
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks import legacy, synthetic
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'golden')
+
+SIZES = [5, 50]
+
+SPEEDS = [10, 20, 50, 100, 200]
+
+# the settings the synthetic files are written with
+CHARGE_CURRENT = 1.0
+POINTS_PER_HALF_CYCLE = 200
+FIRST_VERTICE = 0.8
+SECOND_VERTICE = -0.2
+
+
+def write_files(directory, cycles):
+    """Write the synthetic files of one size into directory, returns their paths."""
+    paths = {
+        'mb': os.path.join(directory, f"mb_{cycles}_MB_C01.mpt"),
+        'ocv': os.path.join(directory, f"ocv_{cycles}_OCV_C01.mpt"),
+        'cv': [os.path.join(directory, f"cv_{cycles}_{speed:03d}_CV_C01.mpt") for speed in SPEEDS],
+        'rrde': os.path.join(directory, f"rrde_{cycles}_RRDE_C01.mpt"),
+    }
+
+    synthetic.modulo_bat(paths['mb'], cycles=cycles, points_per_half_cycle=POINTS_PER_HALF_CYCLE,
+                         current=CHARGE_CURRENT)
+    # as many rows as the Modulo Bat file
+    synthetic.open_circuit_voltage(paths['ocv'], rows=2 * cycles * POINTS_PER_HALF_CYCLE)
+    for path, speed in zip(paths['cv'], SPEEDS):
+        synthetic.cyclic_voltammetry(path, cycles=cycles, speed=speed,
+                                     first_vertice=FIRST_VERTICE, second_vertice=SECOND_VERTICE)
+    synthetic.rrde(paths['rrde'], cycles=cycles)
+
+    return paths
+
+
+def reference_outputs(paths):
+    """Outputs of the original implementations on the files of write_files."""
+    outputs = {}
+
+    mb = legacy.load_mpt_data(paths['mb'])
+    outputs['mb_cropped'] = legacy.resolution_crop(mb, 10, 0.01).index.to_numpy()
+    # the original capacitances were calculated from the half cycles of the uncropped data
+    capacitances = legacy.charge_discharge_capacitances(
+        legacy.extract_half_cycles(legacy.shift_cycles(mb)), CHARGE_CURRENT)
+    outputs['mb_capacitance_cycles'] = capacitances.index.to_numpy(dtype=np.float64)
+    outputs['mb_capacitances'] = capacitances.to_numpy(dtype=np.float64)
+
+    ocv = legacy.load_mpt_data(paths['ocv'])
+    outputs['ocv_cropped'] = legacy.resolution_crop(ocv, 10, 0.01).index.to_numpy()
+
+    for path, speed in zip(paths['cv'], SPEEDS):
+        potential = legacy.load_mpt_data(path)['Ewe/V'].to_numpy()
+        for name, keys in zip(['max', 'min'], legacy.extract_cycle_keys(potential, FIRST_VERTICE, SECOND_VERTICE)):
+            outputs[f"cv_{speed}_{name}_keys"] = np.asarray(keys, dtype=np.int64)
+            outputs[f"cv_{speed}_{name}_potential"] = potential[keys]
+
+    outputs['rrde_ring'] = legacy.load_mpt_data(paths['rrde'])['<Ice>/mA'].to_numpy()
+
+    return outputs
+
+
+def path(cycles):
+    return os.path.join(GOLDEN_DIR, f"{cycles}.npz")
+
+
+def load(cycles):
+    """Golden outputs of a size as dict, None if there is no snapshot for it."""
+    if not os.path.exists(path(cycles)):
+        return None
+
+    with np.load(path(cycles)) as golden:
+        return dict(golden)
+
+
+def main(sizes):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    for cycles in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            outputs = reference_outputs(write_files(directory, cycles))
+        np.savez_compressed(path(cycles), **outputs)
+        print(f"{path(cycles)}: {len(outputs)} arrays")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    arguments = parser.parse_args()
+    main(arguments.sizes)
@@ -0,0 +1,190 @@
+# Reference implementations of the pre-optimization code paths.
+# Kept verbatim so the benchmarks can compare runtime and check that the
+# optimized paths reproduce the original results.
+
+import numpy as np
+import pandas
+import re
+import scipy.signal as sp_sig
+
+
+def load_mpt_data(path):
+    file_contents = open(path).readlines()
+
+    # extract number of header lines from file
+    header_lines = int(re.findall('Nb header lines : ([0-9]+)', file_contents[1])[0])
+
+    ec_data = list(map(lambda el: el.split('\t'), file_contents[header_lines:]))
+    ec_df = pandas.DataFrame(ec_data)
+    ec_df.columns = file_contents[header_lines - 1].replace(' ', '_').split('\t')[:-1]
+    ec_df = ec_df.replace(',', '.', regex=True)
+    ec_df = ec_df.astype(np.float64)
+
+    return ec_df
+
+
+def resolution_crop(data, delta_time, delta_pot):
+    # get a copy of the DataFrame
+    data_cropped = data.copy()
+
+    # set the values from the first row as initial values
+    compare_time = data_cropped.iloc[0]['time/s']
+    compare_pot = data_cropped.iloc[0]['Ewe-Ece/V']
+
+    # walk over ec_df and drop all rows with too small deviation
+    for df_index in data_cropped[1:].index:
+        current_time = data_cropped.loc[df_index, 'time/s']
+        current_pot = data_cropped.loc[df_index, 'Ewe-Ece/V']
+        diff_time = abs(current_time - compare_time)
+        diff_pot = abs(current_pot - compare_pot)
+        if diff_time < delta_time and diff_pot < delta_pot:
+            data_cropped.drop(df_index, inplace=True)
+        else:
+            compare_time = current_time
+            compare_pot = current_pot
+
+    return data_cropped
+
+
+def op_mb_charge_discharge_sheets(op, mpt_file, work_book_name, comment):
+    # worksheet part of op_mb_charge_discharge_data_to_workbook, the graphs did not change
+    work_book = op.new_book()
+    work_book.name = work_book_name
+    work_book.lname = work_book_name
+
+    sheet_all_cycles = work_book.add_sheet(f"All Cycles")
+    cycle_sheets = []
+
+    sheet_all_cycles.from_list(0, list(mpt_file.data_cropped['time/s']), 'Time', 's', '', 'X')
+    sheet_all_cycles.from_list(1, list(mpt_file.data_cropped['Ewe/V']), 'Potential Working', 'V', f"WE {comment}", 'Y')
+    sheet_all_cycles.from_list(2, list(mpt_file.data_cropped['Ece/V']), 'Potential Counter', 'V', f"CE {comment}", 'Y')
+    sheet_all_cycles.from_list(3, list(mpt_file.data_cropped['Ewe-Ece/V']), 'Potential Full Cell', 'V', f"Full Cell {comment}", 'Y')
+
+    for cycle_number, cycle in zip(mpt_file.cycle_numbers, mpt_file.cycles):
+        cycle_sheet = work_book.add_sheet(f"Cycle {cycle_number}")
+
+        cycle_sheet.from_list(0, list(cycle['time/s']), 'Time', 's', '', 'X')
+        cycle_sheet.from_list(1, list(cycle['Ewe/V']),
+                              'Potential Working', 'V', f"WE {comment} Cycle {cycle_number}", 'Y')
+        cycle_sheet.from_list(2, list(cycle['Ece/V']),
+                              'Potential Counter', 'V', f"CE {comment} Cycle {cycle_number}", 'Y')
+        cycle_sheet.from_list(3, list(cycle['Ewe-Ece/V']),
+                              'Potential Full Cell', 'V', f"Full Cell {comment} Cycle {cycle_number}", 'Y')
+        cycle_sheets.append(cycle_sheet)
+
+    sheet_capacitances = work_book.add_sheet(f"Capacitances")
+
+    sheet_capacitances.from_list(0, list(mpt_file.capacitances['Cycle Number']), 'Cycle', '', '', 'X')
+    sheet_capacitances.from_list(1, list(mpt_file.capacitances['Current']), 'Current', 'mA', '', 'N')
+    sheet_capacitances.from_list(2, list(mpt_file.capacitances['Ideal Charge Capacitance']), 'Ideal Charge Capacitance', 'mF', '', 'Y')
+    sheet_capacitances.from_list(3, list(mpt_file.capacitances['Ideal Discharge Capacitance']), 'Ideal Discharge Capacitance', 'mF', '', 'Y')
+    sheet_capacitances.from_list(4, list(mpt_file.capacitances['Charge Ideality']), 'Charge Ideality', '', '', 'Y')
+    sheet_capacitances.from_list(5, list(mpt_file.capacitances['Discharge Ideality']), 'Discharge Ideality', '', '', 'Y')
+    sheet_capacitances.from_list(6, list(mpt_file.capacitances['Faradayic Efficiency']), 'Faradayic Efficiency', '', '', 'Y')
+    sheet_capacitances.from_list(7, list(mpt_file.capacitances['Discharge Polarity Gap']), 'Discharge Polarity Gap', 'V', '', 'Y')
+
+    work_book[0].destroy()
+
+    return work_book
+
+
+def extract_cycle_keys(potential, first_vertice, second_vertice):
+    # CV._extract_cycle_keys on the potential column
+    fv = first_vertice
+    sv = second_vertice
+    th = abs(fv - sv) * 0.01
+
+    max_keys, _ = sp_sig.find_peaks(potential,
+                                    height=(fv - th, fv + th),
+                                    distance=10, width=10)
+    min_keys, _ = sp_sig.find_peaks(potential * (-1),
+                                    height=(-(sv + th), -(sv - th)),
+                                    distance=10, width=10)
+
+    return [list(max_keys), list(min_keys)]
+
+
+def shift_cycles(data):
+    # BiologicFile.shift_cycles on a copy of the data
+    data = data.copy()
+    data['cycle_number'] = data['cycle_number'].shift(-1)
+    data.loc[data.index[-1], 'cycle_number'] = data['cycle_number'].iloc[-2]
+
+    if "half_cycle" in data.columns:
+        data['half_cycle'] = data['half_cycle'].shift(-1)
+        data.loc[data.index[-1], 'half_cycle'] = data['half_cycle'].iloc[-2]
+
+    return data
+
+
+def extract_half_cycles(data):
+    # half cycle part of BiologicFile.extract_cycles, which worked on the uncropped data. The label fix of the
+    # prepended row was written as half_cycles[index].iloc[0]['cycle_number'] = ..., which only assigned in place
+    # with the pandas versions of that time, it is spelled out with iloc / get_loc here
+    half_cycles = []
+    for half_cycle_number in data['half_cycle'].unique():
+        cycle_df = data[
+            # All data where half_cycle is the given value
+            data['half_cycle'] == half_cycle_number
+            ].copy()
+        half_cycles.append(cycle_df)
+
+    for index, cycle_df in enumerate(half_cycles):
+        if index > 0:
+            last_row_previous_cycle = pandas.DataFrame(half_cycles[index - 1].iloc[[-1]])
+            half_cycles[index] = pandas.concat([last_row_previous_cycle, cycle_df], ignore_index=True)
+            for column in ['cycle_number', 'half_cycle']:
+                half_cycles[index].iloc[0, half_cycles[index].columns.get_loc(column)] = cycle_df.iloc[0][column]
+
+    for index, cycle in enumerate(half_cycles):
+        start_time = cycle.loc[cycle.index[0], 'time/s']
+        half_cycles[index]['time/s'] = cycle['time/s'].subtract(start_time)
+
+    return half_cycles
+
+
+def charge_discharge_capacitances(half_cycles, charge_current):
+    # BiologicFile.calculate_charge_discharge_capacitances with its _calculate_*_from_halfcycle helpers
+    capacitances = pandas.DataFrame(columns=['Cycle',
+                                             'Ideal Charge Capacitance',
+                                             'Ideal Discharge Capacitance',
+                                             'Charge Ideality',
+                                             'Discharge Ideality',
+                                             'Faradayic Efficiency',
+                                             'Discharge Polarity Gap',
+                                             ], dtype=np.float64).set_index('Cycle')
+
+    for cycle in half_cycles:
+        cycle_number = int(cycle.loc[0, 'cycle_number']) + 1
+
+        potential_start = float(cycle.loc[0, 'Ewe-Ece/V'])
+        time_start = float(cycle.loc[0, 'time/s'])
+        last_index = cycle.index[-1]
+        potential_end = float(cycle.loc[last_index, 'Ewe-Ece/V'])
+        time_end = float(cycle.loc[last_index, 'time/s'])
+
+        # charge_current is in mA --> capacitance is in mF (should be identical to current / slope)
+        ideal_capacitance = (charge_current * (time_end - time_start)) / abs(potential_end - potential_start)
+
+        slope = (potential_end - potential_start) / (time_end - time_start)
+        intercept = potential_end - (slope * time_end)
+        ideal_potential = intercept + slope * cycle['time/s']
+        residuals_squared_sum = ((cycle['Ewe-Ece/V'] - ideal_potential) ** 2).sum()
+        values_squared_sum = ((cycle['Ewe-Ece/V'] - cycle['Ewe-Ece/V'].mean()) ** 2).sum()
+        r_squared = 1 - (residuals_squared_sum / values_squared_sum)
+
+        polarity_gap = cycle.loc[0, 'Ewe-Ece/V'] - cycle.loc[1, 'Ewe-Ece/V']
+
+        # Take 2nd point of current half_cycle as current indicator to see if charge or discharge
+        if cycle.astype(float).loc[1, 'I/mA'] > 0:
+            capacitances.loc[cycle_number, 'Ideal Charge Capacitance'] = ideal_capacitance
+            capacitances.loc[cycle_number, 'Charge Ideality'] = r_squared
+        else:
+            capacitances.loc[cycle_number, 'Ideal Discharge Capacitance'] = ideal_capacitance
+            capacitances.loc[cycle_number, 'Discharge Ideality'] = r_squared
+            capacitances.loc[cycle_number, 'Discharge Polarity Gap'] = polarity_gap
+
+    capacitances['Faradayic Efficiency'] = \
+        capacitances['Ideal Discharge Capacitance'] / capacitances['Ideal Charge Capacitance']
+
+    return capacitances.sort_index()
@@ -0,0 +1,40 @@
+# Compare the single-pass .mpt parser against the original readlines/split/replace path.
+#
+# usage: python -m benchmarks.load_mpt FILE.mpt [FILE.mpt ...]
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks import legacy
+from pylabhelper.BiologicFile import BiologicFile
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(paths):
+    for path in paths:
+        (_, data, _), fast_time, fast_peak = measure(BiologicFile._load_mpt, path)
+        legacy_data, legacy_time, legacy_peak = measure(legacy.load_mpt_data, path)
+
+        identical = list(data.columns) == list(legacy_data.columns) and \
+            np.array_equal(data.to_numpy(), legacy_data.to_numpy(), equal_nan=True)
+
+        print(f"{path}: {len(data)} rows x {len(data.columns)} columns")
+        print(f"  legacy   {legacy_time:8.3f} s  peak {legacy_peak / 2**20:8.1f} MiB")
+        print(f"  parser   {fast_time:8.3f} s  peak {fast_peak / 2**20:8.1f} MiB")
+        print(f"  speedup  {legacy_time / fast_time:8.1f} x  identical: {identical}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
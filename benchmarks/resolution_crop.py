@@ -0,0 +1,50 @@
+# Compare the single pass resolution_crop against the original row by row DataFrame implementation.
+#
+# usage: python -m benchmarks.resolution_crop [--legacy-limit ROWS]
+#
+# The original implementation is quadratic, by default it is only run up to 10^5 rows.
+
+import argparse
+import time
+
+import numpy as np
+import pandas
+
+from benchmarks import legacy
+from pylabhelper.BiologicFile import BiologicFile
+
+
+def synthetic_file(rows, seed=0):
+    # charge / discharge triangle with noise, sampled every second
+    rng = np.random.default_rng(seed)
+    time_s = np.arange(rows, dtype=np.float64)
+    potential = np.abs(((time_s / 500) % 2) - 1) + rng.normal(0, 0.002, rows)
+
+    data = pandas.DataFrame({'time/s': time_s, 'Ewe-Ece/V': potential})
+    return BiologicFile.from_data({'file_type': 'synthetic'}, data, {'mpt': True})
+
+
+def main(sizes, legacy_limit):
+    for rows in sizes:
+        file = synthetic_file(rows)
+
+        start = time.perf_counter()
+        file.resolution_crop(delta_time=10, delta_pot=0.01)
+        fast_time = time.perf_counter() - start
+
+        print(f"{rows:>8} rows: single pass  {fast_time:8.3f} s, {len(file.data_cropped)} rows kept")
+
+        if rows <= legacy_limit:
+            start = time.perf_counter()
+            reference = legacy.resolution_crop(file.data, 10, 0.01)
+            legacy_time = time.perf_counter() - start
+
+            print(f"{'':>8}       original     {legacy_time:8.3f} s, "
+                  f"speedup {legacy_time / fast_time:6.1f} x, identical: {reference.equals(file.data_cropped)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--legacy-limit', type=int, default=10**5)
+    arguments = parser.parse_args()
+    main([10**4, 10**5, 10**6], arguments.legacy_limit)
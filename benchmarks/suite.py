@@ -0,0 +1,177 @@
+# Time and peak memory of every pipeline stage on synthetic files of several sizes, with golden output checks.
+#
+# usage: python -m benchmarks.suite [--sizes CYCLES ...] [--legacy-limit ROWS]
+#
+# The files are written by benchmarks.golden.write_files into a temporary directory, a size is the number of cycles
+# of the Modulo Bat and CV files (400 rows per Modulo Bat cycle, 2000 rows per CV cycle). The outputs are checked
+# against the reference implementations in benchmarks.legacy, and against the committed snapshots in
+# benchmarks/golden/ which benchmarks.golden computed with those reference implementations. Sizes without a
+# snapshot are only timed. The same stages run as pytest-benchmark tests in tests/test_benchmarks.py.
+
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks import export, golden, legacy
+from benchmarks.load_mpt import measure
+from pylabhelper import biologic
+from pylabhelper import cache as parse_cache
+from pylabhelper import instrument
+from pylabhelper.CV import CV
+from pylabhelper.CVSeries import CVSeries
+from pylabhelper.echem import FCAnalysis
+
+# columns of the original capacitance table, in its order
+CAPACITANCE_COLUMNS = ['Ideal Charge Capacitance', 'Ideal Discharge Capacitance', 'Charge Ideality',
+                       'Discharge Ideality', 'Faradayic Efficiency', 'Discharge Polarity Gap']
+
+MB_STAGES = [
+    ('MB resolution_crop', lambda mb: mb.resolution_crop(delta_time=10, delta_pot=0.01)),
+    ('MB shift_cycles', lambda mb: (mb.shift_time_to_zero(), mb.shift_cycles())),
+    ('MB extract_cycles', lambda mb: mb.extract_cycles()),
+    ('MB capacitances', lambda mb: mb.calculate_charge_discharge_capacitances()),
+]
+
+
+def run_stages(paths):
+    """Run all stages on the files of golden.write_files, returns the timings and the analysed files."""
+    timings = []
+
+    def stage(name, function, *args):
+        result, elapsed, peak = measure(function, *args)
+        timings.append((name, elapsed, peak))
+        return result
+
+    # Modulo Bat charge / discharge
+    mb = stage('MB load_mpt', biologic.load_mpt, paths['mb'])
+    for name, function in MB_STAGES:
+        stage(name, function, mb)
+
+    # Open circuit voltage with as many rows as the Modulo Bat file
+    ocv = stage('OCV load_mpt', biologic.load_mpt, paths['ocv'])
+    stage('OCV resolution_crop', lambda: ocv.resolution_crop(delta_time=10, delta_pot=0.01))
+
+    # Cyclic voltammetry at several speeds, the first one is timed stage by stage
+    cv = stage('CV header', CV, paths['cv'][0])
+    stage('CV load', lambda: cv.original_data)
+    stage('CV recycle', lambda: cv.data)
+    stage('CV interpolate', lambda: cv.interp_data)
+
+    cvs = [cv] + [CV(path) for path in paths['cv'][1:]]
+    stage('FCAnalysis', FCAnalysis, cvs, 1, 2)
+    stage('CVSeries', lambda: CVSeries(paths['cv'], workers=1))
+
+    # the RRDE file is only parsed, there is no analysis for it yet
+    rrde = stage('RRDE load_mpt', biologic.load_mpt, paths['rrde'])
+
+    return timings, {'mb': mb, 'ocv': ocv, 'cvs': cvs, 'rrde': rrde}
+
+
+def outputs(files):
+    """Outputs of the analysed files under the names of the golden snapshots."""
+    results = {}
+
+    mb = files['mb']
+    results['mb_cropped'] = mb.data_cropped.index.to_numpy()
+    capacitances = mb.capacitances.sort_index()
+    results['mb_capacitance_cycles'] = capacitances.index.to_numpy(dtype=np.float64)
+    results['mb_capacitances'] = capacitances[CAPACITANCE_COLUMNS].to_numpy(dtype=np.float64)
+
+    results['ocv_cropped'] = files['ocv'].data_cropped.index.to_numpy()
+
+    for cv, speed in zip(files['cvs'], golden.SPEEDS):
+        potential = cv.original_data.potential.to_numpy()
+        for name, keys in zip(['max', 'min'], cv._extract_cycle_keys()):
+            results[f"cv_{speed}_{name}_keys"] = np.asarray(keys, dtype=np.int64)
+            results[f"cv_{speed}_{name}_potential"] = potential[keys]
+
+    results['rrde_ring'] = files['rrde'].data['<Ice>/mA'].to_numpy()
+
+    return results
+
+
+def compare(results, expected):
+    """Compare outputs with the expected ones of the same names, returns (name, passed) pairs. Row indices and
+    vertex keys have to be identical, values equal up to rounding."""
+    checks = []
+    for name, values in expected.items():
+        actual = results.get(name)
+        if actual is None or actual.shape != values.shape:
+            passed = False
+        elif values.dtype.kind in 'iu':
+            passed = np.array_equal(actual, values)
+        else:
+            passed = np.allclose(actual, values, rtol=1e-9, atol=0, equal_nan=True)
+        checks.append((name, passed))
+    return checks
+
+
+def reference_checks(paths, files, legacy_limit):
+    """Compare with the original implementations run on the same files, returns (name, passed) pairs."""
+    checks = []
+
+    reference = legacy.load_mpt_data(paths['mb'])
+    data = biologic.load_mpt(paths['mb'], cache=False).data
+    checks.append(('load_mpt == legacy', list(data.columns) == list(reference.columns) and
+                   np.array_equal(data.to_numpy(dtype=np.float64), reference.to_numpy(), equal_nan=True)))
+
+    if len(reference) <= legacy_limit:
+        cropped = legacy.resolution_crop(reference, 10, 0.01)
+        checks.append(('resolution_crop == legacy',
+                       np.array_equal(files['mb'].data_cropped.index.to_numpy(), cropped.index.to_numpy())))
+
+    # the bulk Origin export (against the fake originpro) has to write the same sheets as the original one
+    checks.append(('MB sheets export == legacy', export.compare_sheets(files['mb'])[3]))
+
+    # vertex positions and potentials of every speed
+    for cv, speed in zip(files['cvs'], golden.SPEEDS):
+        potential = cv.original_data.potential.to_numpy()
+        keys = legacy.extract_cycle_keys(potential, cv.first_vertice, cv.second_vertice)
+        checks.append((f"CV {speed} mV/s vertices == legacy", all(
+            np.array_equal(found, expected) and np.array_equal(potential[found], potential[expected])
+            for found, expected in zip(cv._extract_cycle_keys(), keys))))
+
+    return checks
+
+
+def golden_checks(cycles, results):
+    """Compare with the snapshot of this size, returns (name, passed) pairs, none if there is no snapshot."""
+    expected = golden.load(cycles)
+    if expected is None:
+        return []
+    return [(f"{name} == golden", passed) for name, passed in compare(results, expected)]
+
+
+def main(sizes, legacy_limit):
+    # every file is new, the parse cache would only fill up
+    parse_cache.enabled = False
+    instrument.listeners.append(instrument.print_event)
+
+    failed = 0
+    for cycles in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = golden.write_files(directory, cycles)
+            timings, files = run_stages(paths)
+            checks = reference_checks(paths, files, legacy_limit) + golden_checks(cycles, outputs(files))
+
+        print(f"{cycles} cycles ({len(files['mb'].data)} Modulo Bat rows, "
+              f"{len(files['cvs'][0].original_data)} CV rows)")
+        for name, elapsed, peak in timings:
+            print(f"  {name:<20} {elapsed:8.3f} s  peak {peak / 2**20:8.1f} MiB")
+        if golden.load(cycles) is None:
+            print(f"  skip no golden snapshot for {cycles} cycles (python -m benchmarks.golden --sizes {cycles})")
+        for name, passed in checks:
+            print(f"  {'ok  ' if passed else 'FAIL'} {name}")
+            failed += not passed
+
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=golden.SIZES + [250])
+    parser.add_argument('--legacy-limit', type=int, default=20000,
+                        help='largest row count the quadratic legacy resolution_crop is run on')
+    arguments = parser.parse_args()
+    raise SystemExit(1 if main(arguments.sizes, arguments.legacy_limit) else 0)
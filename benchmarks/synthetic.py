@@ -0,0 +1,221 @@
+# Deterministic generator of synthetic EC-Lab ASCII exports (.mpt) for benchmarks and golden checks.
+#
+# The files follow the layout the parsers expect: the 'Nb header lines' count, the technique name in line 4,
+# 'key : value' header lines, a technique table in columns of 20 characters, the column line with a trailing
+# tab and tab separated data with decimal comma and Windows line endings. The same arguments always produce
+# byte identical files.
+#
+# usage: python -m benchmarks.synthetic DIRECTORY [--cycles N] [--rows N]
+
+import argparse
+import os
+
+import numpy as np
+import pandas
+
+ACQUISITION_STARTED = '10/18/2026 08:00:00.000'
+
+
+def modulo_bat(path, cycles=50, points_per_half_cycle=200, current=1.0, capacitance=500.0, seed=0):
+    """Galvanostatic charge / discharge (Modulo Bat) with current in mA and capacitance in mF."""
+    rng = np.random.default_rng(seed)
+    half_cycles = 2 * cycles
+    rows = half_cycles * points_per_half_cycle
+
+    half_cycle = np.repeat(np.arange(half_cycles), points_per_half_cycle)
+    charging = half_cycle % 2 == 0
+    step = np.tile(np.arange(points_per_half_cycle), half_cycles)
+
+    # slightly non-linear charge curve between 0 and about 1 V, plus a polarization jump at every reversal
+    time_step = 1.0
+    swing = current * time_step * points_per_half_cycle / capacitance
+    progress = step / points_per_half_cycle
+    full_cell = np.where(charging, swing * progress ** 0.95, swing * (1 - progress) ** 1.05)
+    full_cell += np.where(charging, 0.01, -0.01) + rng.normal(0, 0.0005, rows)
+
+    data = {
+        'mode': np.ones(rows, dtype=np.int64),
+        'ox/red': charging.astype(np.int64),
+        'error': np.zeros(rows, dtype=np.int64),
+        'control changes': (step == 0).astype(np.int64),
+        'Ns changes': (step == 0).astype(np.int64),
+        'counter inc.': np.zeros(rows, dtype=np.int64),
+        'Ns': (half_cycle % 2).astype(np.int64),
+        'time/s': np.arange(rows) * time_step,
+        'control/V/mA': np.where(charging, current, -current),
+        'Ewe/V': full_cell / 2 + 3.0,
+        'I/mA': np.where(charging, current, -current) + rng.normal(0, current * 1e-4, rows),
+        'dQ/mA.h': np.full(rows, current * time_step / 3600),
+        '(Q-Qo)/mA.h': np.cumsum(np.where(charging, 1, -1) * current * time_step / 3600),
+        'half cycle': half_cycle.astype(np.float64),
+        'Ece/V': 3.0 - full_cell / 2,
+        'Ewe-Ece/V': full_cell,
+        'cycle number': (half_cycle // 2).astype(np.float64),
+    }
+
+    technique = [
+        ['Ns', '0', '1'],
+        ['Set I/C', 'I', 'I'],
+        ['ctrl_type', 'CC', 'CC'],
+        ['ctrl1_val', _decimal_comma(current), _decimal_comma(-current)],
+        ['ctrl1_val_unit', 'mA', 'mA'],
+        ['ctrl1_val_vs', '<None>', '<None>'],
+        ['ctrl_seq', '0', '0'],
+        ['lim1_value', _decimal_comma(swing), '0,000'],
+        ['lim1_value_unit', 'V', 'V'],
+    ]
+
+    _write(path, 'Modulo Bat', data, {'Electrode material': 'synthetic', 'Mass of active material': '0,001 mg'},
+           technique)
+
+
+def open_circuit_voltage(path, rows=10000, seed=0):
+    """Relaxation of the open circuit voltage, one row per second."""
+    rng = np.random.default_rng(seed)
+    time_s = np.arange(rows, dtype=np.float64)
+    full_cell = 0.05 + 0.2 * np.exp(-time_s / (rows / 5)) + rng.normal(0, 0.0005, rows)
+
+    data = {
+        'mode': np.full(rows, 3, dtype=np.int64),
+        'error': np.zeros(rows, dtype=np.int64),
+        'time/s': time_s,
+        'Ewe/V': full_cell / 2 + 3.0,
+        'Ece/V': 3.0 - full_cell / 2,
+        'Ewe-Ece/V': full_cell,
+    }
+
+    technique = [
+        ['tR (h:m:s)', '0:10:0,0000'],
+        ['dER/dt (mV/h)', '0,0'],
+        ['record', 'Ewe'],
+        ['dER (mV)', '0,00'],
+        ['dtR (s)', '1,0000'],
+    ]
+
+    _write(path, 'Open Circuit Voltage', data, {}, technique)
+
+
+def cyclic_voltammetry(path, cycles=5, speed=20.0, first_vertice=0.8, second_vertice=-0.2, start_vertice=0.3,
+                       step=0.001, seed=0, file_type='Cyclic Voltammetry'):
+    """Cyclic voltammetry from start_vertice to first_vertice, then cycles between the vertices and back to
+    start_vertice, with speed in mV/s and one row per step V. The current is a capacitive box plus a
+    diffusion limited redox couple, in mA."""
+    rng = np.random.default_rng(seed)
+
+    # potential course as segments between the turning points
+    turning = [start_vertice] + [first_vertice, second_vertice] * cycles + [first_vertice, start_vertice]
+    potential = np.concatenate([
+        np.linspace(start, stop, max(int(round(abs(stop - start) / step)), 1), endpoint=False)
+        for start, stop in zip(turning[:-1], turning[1:])
+    ] + [[start_vertice]])
+    rows = len(potential)
+
+    direction = np.sign(np.diff(potential, append=potential[-1]))
+    direction[-1] = direction[-2] if rows > 1 else 1
+    time_s = np.arange(rows) * step / (speed / 1000)
+
+    # every reversal at a vertex starts a new half cycle, every return to first_vertice a new cycle
+    reversal = np.r_[False, direction[1:] != direction[:-1]]
+    half_cycle = np.cumsum(reversal)
+    cycle = np.cumsum(reversal & np.isclose(potential, first_vertice, atol=step))
+
+    scale = np.sqrt(speed / 20)
+    redox = 0.05 * scale * direction * np.exp(-((potential - 0.3 - 0.03 * direction) / 0.05) ** 2)
+    current = 0.02 * speed / 20 * direction + redox + rng.normal(0, 0.0005, rows)
+
+    data = {
+        'mode': np.full(rows, 2, dtype=np.int64),
+        'ox/red': (direction > 0).astype(np.int64),
+        'error': np.zeros(rows, dtype=np.int64),
+        'control changes': reversal.astype(np.int64),
+        'counter inc.': np.zeros(rows, dtype=np.int64),
+        'time/s': time_s,
+        'control/V': potential,
+        'Ewe/V': potential + rng.normal(0, 0.0002, rows),
+        '<I>/mA': current,
+        'cycle number': cycle.astype(np.float64),
+        '(Q-Qo)/mA.h': np.cumsum(current) * (time_s[1] - time_s[0] if rows > 1 else 0) / 3600,
+        'half_cycle number': half_cycle.astype(np.float64),
+    }
+    if file_type == 'RRDE':
+        # ring electrode of the bipotentiostat at constant potential, collecting the disk product
+        data['Ece/V'] = np.full(rows, 1.2) + rng.normal(0, 0.0002, rows)
+        data['<Ice>/mA'] = -0.3 * np.clip(redox, 0, None) + rng.normal(0, 0.0001, rows)
+
+    settings = {
+        'dE/dt': _decimal_comma(speed),
+        'dE/dt unit': 'mV/s',
+        'Ei (V)': _decimal_comma(start_vertice),
+        'E1 (V)': _decimal_comma(first_vertice),
+        'E2 (V)': _decimal_comma(second_vertice),
+        'Ef (V)': _decimal_comma(start_vertice),
+        'nc cycles': str(cycles),
+    }
+    technique = [[name, value] for name, value in settings.items()]
+
+    _write(path, file_type, data, {}, technique)
+
+
+def rrde(path, cycles=5, speed=20.0, seed=0, **kwargs):
+    """Rotating ring disk measurement, the disk runs a cyclic voltammetry."""
+    cyclic_voltammetry(path, cycles=cycles, speed=speed, seed=seed, file_type='RRDE', **kwargs)
+
+
+def _write(path, file_type, data, settings, technique):
+    if file_type == 'RRDE':
+        technique_lines = ['DISK CHANNEL SETTING', 'Cyclic Voltammetry']
+    else:
+        technique_lines = [file_type, '']
+
+    header = [
+        'Run on channel : 1 (SN 0001)',
+        'User : ',
+        'Ewe ctrl range : min = -10,00 V, max = 10,00 V',
+        f"Acquisition started on : {ACQUISITION_STARTED}",
+        'Saved on :',
+        f"File : {os.path.basename(path)}",
+        'Device : VMP-300 (SN 0001)',
+        'Record Ece',
+    ]
+    header += [f"{name} : {value}" for name, value in settings.items()]
+    header.append('Cycle Definition : Charge/Discharge alternance')
+    # technique table in columns of 20 characters, closed by an empty line
+    header += [''.join(cell.ljust(20) for cell in row) for row in technique]
+    header.append('')
+
+    lines = ['EC-Lab ASCII FILE', None, ''] + technique_lines + header + ['\t'.join(data) + '\t']
+    lines[1] = f"Nb header lines : {len(lines)}"
+
+    frame = pandas.DataFrame(data)
+    with open(path, 'w', encoding='latin-1', newline='') as file:
+        file.write('\r\n'.join(lines) + '\r\n')
+        frame.to_csv(file, sep='\t', decimal=',', float_format='%.7E', header=False, index=False,
+                     lineterminator='\r\n')
+
+
+def _decimal_comma(value):
+    return f"{value:.3f}".replace('.', ',')
+
+
+def write_set(directory, cycles=20, rows=10000, seed=0):
+    """Write one file of every kind into directory, returns their paths by kind."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {kind: os.path.join(directory, f"synthetic_{index:02d}_{kind}_C01.mpt")
+             for index, kind in enumerate(['OCV', 'MB', 'CV', 'RRDE'])}
+
+    open_circuit_voltage(paths['OCV'], rows=rows, seed=seed)
+    modulo_bat(paths['MB'], cycles=cycles, seed=seed)
+    cyclic_voltammetry(paths['CV'], cycles=cycles, seed=seed)
+    rrde(paths['RRDE'], cycles=cycles, seed=seed)
+
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory')
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=10000)
+    arguments = parser.parse_args()
+    for kind, path in write_set(arguments.directory, arguments.cycles, arguments.rows).items():
+        print(f"{kind:>5}  {path}")
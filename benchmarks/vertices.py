@@ -0,0 +1,65 @@
+# Compare the hysteresis turning point detector against the original find_peaks vertex search
+# on synthetic triangle waves (upper - lower - upper CV scans with noise).
+#
+# usage: python -m benchmarks.vertices [--noise VOLTS] [--points-per-cycle N]
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import legacy
+import pylabhelper.math as lm
+from pylabhelper.CV import VERTEX_HYSTERESIS
+
+UPPER = 0.8
+LOWER = -0.2
+
+
+def triangle_wave(rows, points_per_cycle, noise, seed=0):
+    # starts in between the vertices, scans up to UPPER first and ends somewhere in between
+    rng = np.random.default_rng(seed)
+    phase = (np.arange(rows) / points_per_cycle + 0.2) % 1
+    potential = LOWER + (UPPER - LOWER) * np.where(phase < 0.5, 2 * phase, 2 - 2 * phase)
+    return potential + rng.normal(0, noise, rows)
+
+
+def matched(found, expected, tolerance):
+    # ideal vertices with a found vertex within tolerance rows
+    found = np.sort(np.asarray(found, dtype=np.int64))
+    if len(found) == 0:
+        return 0
+    after = np.clip(np.searchsorted(found, expected), 0, len(found) - 1)
+    before = np.clip(after - 1, 0, len(found) - 1)
+    distance = np.minimum(np.abs(found[after] - expected), np.abs(found[before] - expected))
+    return int(np.sum(distance <= tolerance))
+
+
+def main(points_per_cycle, noise):
+    for rows in [10**5, 10**6, 10**7]:
+        potential = triangle_wave(rows, points_per_cycle, noise)
+        ideal_max = np.arange(int(0.3 * points_per_cycle), rows, points_per_cycle)
+        ideal_min = np.arange(int(0.8 * points_per_cycle), rows, points_per_cycle)
+        tolerance = points_per_cycle // 20
+
+        start = time.perf_counter()
+        max_keys, min_keys = legacy.extract_cycle_keys(potential, UPPER, LOWER)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        maxima, minima = lm.turning_points(potential, (UPPER - LOWER) * VERTEX_HYSTERESIS)
+        fast_time = time.perf_counter() - start
+
+        print(f"{rows:>9} rows, {len(ideal_max)} upper / {len(ideal_min)} lower vertices")
+        print(f"  find_peaks  {legacy_time:8.3f} s  found {len(max_keys):>6} / {len(min_keys):>6}, "
+              f"matching {matched(max_keys, ideal_max, tolerance):>6} / {matched(min_keys, ideal_min, tolerance):>6}")
+        print(f"  hysteresis  {fast_time:8.3f} s  found {len(maxima):>6} / {len(minima):>6}, "
+              f"matching {matched(maxima, ideal_max, tolerance):>6} / {matched(minima, ideal_min, tolerance):>6}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--noise', type=float, default=0.005)
+    parser.add_argument('--points-per-cycle', type=int, default=2000)
+    arguments = parser.parse_args()
+    main(arguments.points_per_cycle, arguments.noise)
@@ -1,6 +1,6 @@
 import os.path
 
-from pylabhelper import biologic
+from pylabhelper import biologic, instrument
 import originpro as op
 
 # # Read in File ##
@@ -10,6 +10,13 @@ base_path = os.path.split(op.get_lt_str('fname'))[0]
 sample_name = 'BeKo0001 - 2Ly GCL'
 layers = 2
 
+# record time, rows and memory of every stage, the report is written next to the files
+profile = False
+
+# show the loading progress in the Origin console, the module stays imported between runs of the script
+if instrument.print_event not in instrument.listeners:
+    instrument.listeners.append(instrument.print_event)
+
 ## Hier Files eintragen
 file_list = {
     f"Initial OCV 1": f"BeKo0001 - 2Ly Glued Conductive Lacquer_02_OCV_C01.mpt",
@@ -58,30 +65,32 @@ cd_list = [
 
 # ################# Read in Files #################
 
-for name, file_name in file_list.items():
-    file_list[name] = biologic.load_mpt(base_path + '/' + file_name)
-
-print('Finished reading all files BiologicFile Objects')
-
-for name in cd_list:
-    file_list[name].crop_columns_to(['time/s', 'cycle_number', 'half_cycle', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V', 'I/mA'])
-    file_list[name].resolution_crop(delta_time=10, delta_pot=0.01)
-
-print('Finished cropping all files in the \'cd_list\'')
-
-for name in ocv_list:
-    file_list[name].crop_columns_to(['time/s', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V'])
-    file_list[name].resolution_crop(delta_time=10, delta_pot=0.01)
+if profile:
+    instrument.enable()
+
+# Files are parsed and processed with these pipelines, see the load_mpt_many call below
+cd_pipeline = [
+    ('crop_columns_to', {'list_of_columns': ['time/s', 'cycle_number', 'half_cycle', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V', 'I/mA']}),
+    ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+    'shift_time_to_zero',
+    'shift_cycles',
+    'extract_cycles',
+    'calculate_charge_discharge_capacitances',
+]
 
-print('Finished cropping all files in the \'ocv_list\'')
+ocv_pipeline = [
+    ('crop_columns_to', {'list_of_columns': ['time/s', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V']}),
+    ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+]
 
-for name in cd_list:
-    file_list[name].shift_time_to_zero()
-    file_list[name].shift_cycles()
-    file_list[name].extract_cycles()
-    file_list[name].calculate_charge_discharge_capacitances()
+pipelines = {name: cd_pipeline for name in cd_list}
+pipelines.update({name: ocv_pipeline for name in ocv_list})
 
-print('Finished calculating the capacitances from all files in \'cd_list\'')
+file_paths = {name: base_path + '/' + file_name for name, file_name in file_list.items()}
+# Origin's embedded interpreter has no main guard for process pool workers to re-import, so everything is loaded
+# in this process. For many files run pylabhelper.engine outside Origin and load its results with
+# load-precomputed-results.py instead.
+file_list = biologic.load_mpt_many(file_paths, workers=1, pipeline=pipelines)
 
 # ################# Output Workbooks and Graphs #################
 
@@ -94,3 +103,6 @@ for name in cd_list:
 full_cap_data = map(lambda index: file_list[index], cd_list)
 biologic.op_capacitances_workbook(full_cap_data, 'Capacitances', sample_name, layers)
 
+if profile:
+    print(instrument.report_text(file_list))
+    instrument.report_json(file_list, f"{base_path}/{sample_name} profile.json")
@@ -9,8 +9,7 @@ file_name, _ = os.path.splitext(file_name)
 
 # ################# Read in Files #################
 
-file = biologic.load_mpt(path)
-file.crop_columns_to(['time/s', 'cycle_number', 'half_cycle', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V', 'I/mA'])
+file = biologic.load_mpt(path, columns=['time/s', 'cycle_number', 'half_cycle', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V', 'I/mA'])
 file.resolution_crop(delta_time=10, delta_pot=0.01)
 file.shift_cycles()
 file.extract_cycles()
@@ -0,0 +1,29 @@
+import os.path
+
+from pylabhelper import biologic, engine
+import originpro as op
+
+# # Read in Results ##
+# select the index.json of a result directory written by
+#   python -m pylabhelper.engine RESULTS --pipeline cd ..._MB_C01.mpt --pipeline ocv ..._OCV_C01.mpt
+result_path = os.path.split(op.get_lt_str('fname'))[0]
+
+## Hier Daten Eintragen
+sample_name = os.path.basename(result_path)
+layers = 2
+
+# ################# Load precomputed Tables #################
+
+# Only the binary tables are mapped, all parsing and analysis already ran outside of Origin
+file_list = engine.load_results(result_path)
+cd_list = [name for name, mpt_file in file_list.items() if mpt_file.capacitances is not None]
+
+# ################# Output Workbooks and Graphs #################
+
+biologic.op_list_of_files_to_workbook(file_list.values(), f"{sample_name} Full Measurement", sample_name)
+
+for name in cd_list:
+    biologic.op_mb_charge_discharge_data_to_workbook(file_list[name], f"{sample_name} {name}", name)
+
+full_cap_data = map(lambda index: file_list[index], cd_list)
+biologic.op_capacitances_workbook(full_cap_data, 'Capacitances', sample_name, layers)
@@ -1,28 +1,252 @@
+import io
 import numpy as np
 import pandas
 import pylabhelper.math as lm
-import re
+import pylabhelper.mpt as mpt
+from pylabhelper import cache as parse_cache
+from pylabhelper import instrument
+from pylabhelper.cycles import CycleIndex
 from textwrap import wrap
 import warnings
 
 
 class BiologicFile:
 
-    def __init__(self, path):
-        self.header, self.data, self.history = self._load_mpt(path)
+    def __init__(self, path, usecols=None, compact=False, float32=False, cache=True):
+        # usecols restricts the data to these columns (in this order), the others are skipped while parsing
+        # compact stores counters and flags as int / bool, float32 the measured signals as float32 as well (see
+        # mpt.compact), by default every column stays float64 as parsed, so exports see the values of the file
+        # cache=False bypasses the binary parse cache (see pylabhelper/cache.py)
+        variant = f"BiologicFile {usecols!r} {compact} {float32}"
+
+        with instrument.measure('load_mpt') as record:
+            cached = parse_cache.load(path, variant) if cache else None
+
+            if cached is None:
+                self.header, self.data, self.history = self._load_mpt(path, usecols)
+                if compact or float32:
+                    self.data = mpt.compact(self.data, float32=float32)
+                if cache:
+                    parse_cache.store(path, variant, (self.header, self.history), self.data)
+            else:
+                (self.header, self.history), self.data = cached
+
+        # recorded after storing, so a cached history never carries the stages of an earlier import
+        if record is not None:
+            record.update(rows_in=None, rows_out=len(self.data), cached=cached is not None)
+            self.history.setdefault('stages', []).append(record)
+
+        self._reset_derived()
+
+    @classmethod
+    def from_data(cls, header, data, history=None):
+        """ Creating a BiologicFile object from already parsed header and data """
+        file = cls.__new__(cls)
+        file.header = header
+        file.data = data
+        file.history = {'mpt': True} if history is None else history
+        file._reset_derived()
+        return file
+
+    @classmethod
+    def iter_chunks(cls, path, chunksize=100000, by=None, usecols=None, compact=False, float32=False):
+        """ Reading an mpt file as a sequence of BiologicFile objects holding at most chunksize rows each
+
+        With by set to a label column (e.g. 'cycle_number') the rows are regrouped so that every chunk holds
+        exactly one complete cycle. The raw text is never held in memory, only the current chunk.
+
+        Every chunk knows the rows of the file before it, so the pipeline methods applied to the chunks in order
+        give the rows of the same pipeline on the whole file: resolution_crop continues from the last row kept in
+        the previous chunk, shift_time_to_zero subtracts the start time of the file, shift_cycles moves the last
+        row of a chunk into the next one (as the relabeling does in the whole file) and extract_cycles prepends the
+        row before the chunk to its first cycle."""
+        with open(path, 'rb') as file:
+            header, columns = cls._read_header(file)
+            # the label column is needed for the split, it is dropped again if it was not asked for
+            read_columns = usecols if usecols is None or by is None or by in usecols else list(usecols) + [by]
+            reader = mpt.read_data(file, columns, usecols=read_columns, chunksize=chunksize)
+
+            # shared by all chunks, before is updated while reading, crop_reference by resolution_crop()
+            carry = {'start_time': None, 'crop_reference': None, 'before': None}
+
+            # one piece is held back to know which one is the last
+            pending = None
+            chunk_number = 0
+            for piece in cls._split_chunks(reader, read_columns, by, compact, float32):
+                if pending is not None:
+                    yield cls._chunk_file(header, pending, chunk_number, False, carry, usecols, by)
+                    chunk_number += 1
+                pending = piece
+
+            if pending is not None:
+                yield cls._chunk_file(header, pending, chunk_number, True, carry, usecols, by)
+
+    @staticmethod
+    def _split_chunks(reader, read_columns, by, compact, float32):
+        remainder = None
+        for chunk in reader:
+            if read_columns is not None:
+                chunk = chunk[read_columns]
+            if compact or float32:
+                chunk = mpt.compact(chunk, float32=float32)
+            if by is None:
+                yield chunk
+                continue
+            if remainder is not None:
+                chunk = pandas.concat([remainder, chunk])
+
+            # the trailing cycle may continue in the next chunk, keep it back
+            labels = chunk[by].to_numpy()
+            starts = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+            for start, stop in zip(np.r_[0, starts][:-1], starts):
+                yield chunk.iloc[start:stop].copy()
+            remainder = chunk.iloc[starts[-1] if len(starts) else 0:]
+
+        if remainder is not None and len(remainder):
+            yield remainder.copy()
+
+    @classmethod
+    def _chunk_file(cls, header, data, chunk_number, last, carry, usecols, by):
+        if usecols is not None and by is not None and by not in usecols:
+            data = data.drop(columns=by)
+        if carry['start_time'] is None and 'time/s' in data.columns:
+            carry['start_time'] = data['time/s'].iloc[0]
+
+        file = cls.from_data(header, data, {'mpt': True, 'chunk': chunk_number})
+        file._chunk = {'before': carry['before'], 'last': last, 'carry': carry}
+
+        # the last two rows of the file read so far, the boundary row and the one prepended to its cycle
+        rows = data if carry['before'] is None else pandas.concat([carry['before'], data])
+        carry['before'] = rows.iloc[-2:].copy()
+        return file
+
+    @classmethod
+    def live(cls, path, usecols=None, compact=False, float32=False):
+        """ Opening the file of a running measurement for incremental reading
+
+        Only complete rows are read, poll() reads the rows appended since then. The pipeline methods applied to the
+        returned object (resolution_crop, shift_time_to_zero, shift_cycles, extract_cycles and
+        calculate_charge_discharge_capacitances) are carried on to the appended rows by poll()."""
+        with open(path, 'rb') as file:
+            header, columns = cls._read_header(file, live=True)
+            offset = file.tell()
+            contents = file.read()
+
+        file = cls.from_data(header, pandas.DataFrame(columns=usecols or columns, index=pandas.RangeIndex(0), dtype=np.float64))
+        file._live = {
+            'path': path,
+            'columns': columns,
+            'usecols': usecols,
+            'compact': compact,
+            'float32': float32,
+            'offset': offset,
+            'buffers': {},
+        }
+
+        rows = file._read_appended(contents)
+        if rows is not None:
+            file.data = rows
+
+        return file
+
+    @instrument.stage()
+    def poll(self):
+        """ Reading the rows appended to a live file (see live()) since the last poll
+
+        Only the new rows are parsed and processed: they are appended to data (and data_cropped), the running cycle
+        and half cycle are rebuilt together with the appended ones and the capacitances are fitted only for these
+        half cycles. Returns the number of new rows."""
+        if self._live is None:
+            raise Exception('Not a live file, open it with BiologicFile.live()')
+
+        with open(self._live['path'], 'rb') as file:
+            file.seek(self._live['offset'])
+            rows = self._read_appended(file.read())
+
+        if rows is None:
+            return 0
+
+        first_new = len(self.data)
+        rows.index = pandas.RangeIndex(first_new, first_new + len(rows))
 
+        # one buffer for relabeling and appending, a second _buffer() call would refill it from the unmodified data
+        data = self._buffer('data')
+
+        # the pipeline steps are replayed on the new rows in the order they were applied
+        for step, arguments in self.history.items():
+            if step == 'resolution_crop' and self.data_cropped is not None:
+                self._append_rows('data_cropped', self._crop_appended(rows, arguments))
+
+            if step == 'time_shifted':
+                # shifted while still empty, the first polled row is the start
+                if arguments['start_time'] is None:
+                    arguments['start_time'] = rows['time/s'].iloc[0]
+                rows['time/s'] = rows['time/s'] - arguments['start_time']
+
+            if step == 'cycles_shifted':
+                for column in ['cycle_number', 'half_cycle']:
+                    if column in rows.columns:
+                        labels = rows[column].to_numpy()
+                        # the former last row takes the label of its (now known) successor
+                        if first_new > 0:
+                            data.arrays[column][first_new - 1] = labels[0]
+                        rows[column] = self._shift_labels(labels)
+
+        self._append_rows('data', rows, buffer=data)
+        self._cycle_indices = {}
+
+        if 'cycles_extracted' in self.history:
+            self._extend_segments('cycle_number', first_new)
+            if 'half_cycle' in self.data.columns:
+                self._extend_segments('half_cycle', first_new)
+
+        return len(rows)
+
+    def _reset_derived(self):
         # produced in resolution_crop()
         self.data_cropped = None
 
-        # produced in extract_cycles()
+        # produced on demand in cycle_index(), keyed by (column, cropped)
+        self._cycle_indices = {}
+
+        # produced in extract_cycles(), cycles and half_cycles are views on _cycle_data and _half_cycle_data
+        self._cycle_data = None
+        self._cycle_segments = None
+        self._half_cycle_data = None
+        self._half_cycle_segments = None
         self.cycles = None
         self.cycle_numbers = []
         self.half_cycles = None
         self.half_cycle_numbers = []
 
-        # produced in calculate_charge_discharge_capacitances()
+        # produced in calculate_charge_discharge_capacitances(), with the fit values of every half cycle
         self.capacitances = None
+        self._half_cycle_values = None
+
+        # read position and row buffers of a file opened with live()
+        self._live = None
+
+        # rows of the file before a chunk of iter_chunks() and the state shared by its chunks
+        self._chunk = None
+
+    def __getstate__(self):
+        # cycles and half_cycles are views on _cycle_data and _half_cycle_data, pickled (e.g. sent back from a
+        # load_mpt_many worker) they would be copies next to them, so they are rebuilt from the segments instead
+        return dict(self.__dict__, cycles=None, half_cycles=None)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._cycle_segments is not None:
+            self.cycles = list(self._cycle_segments.slices(self._cycle_data))
+        if self._half_cycle_segments is not None:
+            self.half_cycles = list(self._half_cycle_segments.slices(self._half_cycle_data))
 
+    @property
+    def schema(self):
+        """ Kind (counter, flag or signal) and storage dtype of every column of data """
+        return mpt.schema(self.data)
+
+    @instrument.stage(rows_out='data_cropped')
     def resolution_crop(self, **kwargs):
         # kwargs:
         #   delta_time in s
@@ -37,118 +261,173 @@ class BiologicFile:
         if 'delta_pot' not in kwargs:
             raise Exception('delta_pot needs to be set')
 
-        # get a copy of the DataFrame
-        self.data_cropped = self.data.copy()
-
         # get the cropping arguments
         delta_time = kwargs.get('delta_time')  # in s
         delta_pot = kwargs.get('delta_pot')  # in V
 
-        # set the values from the first row as initial values
-        compare_time = self.data_cropped.iloc[0]['time/s']
-        compare_pot = self.data_cropped.iloc[0]['Ewe-Ece/V']
-
-        # walk over ec_df and drop all rows with too small deviation
-        for df_index in self.data_cropped[1:].index:
-            current_time = self.data_cropped.loc[df_index, 'time/s']
-            current_pot = self.data_cropped.loc[df_index, 'Ewe-Ece/V']
-            diff_time = abs(current_time - compare_time)
-            diff_pot = abs(current_pot - compare_pot)
-            if diff_time < delta_time and diff_pot < delta_pot:
-                self.data_cropped.drop(df_index, inplace=True)
-            else:
-                compare_time = current_time
-                compare_pot = current_pot
+        # walk over the arrays and keep only rows with large enough deviation from the last kept row
+        time = self.data['time/s'].to_numpy()
+        potential = self.data['Ewe-Ece/V'].to_numpy()
+        reference = self._chunk['carry']['crop_reference'] if self._chunk is not None else None
+        if reference is None:
+            keep = self._resolution_keep_mask(time, potential, delta_time, delta_pot)
+        else:
+            # a chunk continues from the last row kept in the previous chunk
+            keep = self._resolution_keep_mask(np.r_[reference[0], time], np.r_[reference[1], potential],
+                                              delta_time, delta_pot)[1:]
+        self.data_cropped = self.data[keep].copy()
+
+        if self._chunk is not None and keep.any():
+            self._chunk['carry']['crop_reference'] = (time[keep][-1], potential[keep][-1])
+
+        # cycle indices of the data carry over to the cropped data, those of an earlier crop are stale
+        self._cycle_indices = {key: index for key, index in self._cycle_indices.items() if not key[1]}
+        for (column, _), index in list(self._cycle_indices.items()):
+            self._cycle_indices[(column, True)] = index.compress(keep)
 
         # set the history
         self.history['resolution_crop'] = {'delta_time': delta_time, 'delta_pot': delta_pot}
 
+    @instrument.stage()
     def shift_time_to_zero(self):
+        # without rows yet (a live file) the shift is deferred to the first poll()
+        if len(self.data) == 0:
+            self.history['time_shifted'] = {'start_time': None}
+            return
+
         start_time = self.data.loc[self.data.index[0], 'time/s']
+        if self._chunk is not None:
+            # the time of every chunk starts with the file
+            start_time = self._chunk['carry']['start_time']
+            if self._chunk['before'] is not None:
+                self._chunk['before'] = self._chunk['before'].assign(
+                    **{'time/s': self._chunk['before']['time/s'] - start_time})
         self.data['time/s'] = self.data['time/s'].subtract(start_time)
 
-        self.history['time_shifted'] = True
+        self.history['time_shifted'] = {'start_time': start_time}
 
+    @instrument.stage()
     def shift_cycles(self):
         # check if ec_data has half_cycle information
         if "cycle_number" not in self.data.columns:
             raise Exception('Data does not contain half_cycle information')
 
-        # Shift Cycle Data up by 1
-        self.data['cycle_number'] = self.data['cycle_number'].shift(-1)
-        self.data.loc[self.data.index[-1], 'cycle_number'] = self.data['cycle_number'].iloc[-2]
-
         # check if ec_df has half_cycle information
-        if "half_cycle" in self.data.columns:
-            self.data['half_cycle'] = self.data['half_cycle'].shift(-1)
-            self.data.loc[self.data.index[-1], 'half_cycle'] = self.data['half_cycle'].iloc[-2]
+        label_columns = ['cycle_number'] + (['half_cycle'] if "half_cycle" in self.data.columns else [])
+
+        if self._chunk is not None:
+            self._shift_chunk_labels(label_columns)
+        else:
+            # Shift Cycle Data up by 1, the last row keeps its label (and the column its dtype)
+            for column in label_columns:
+                self.data[column] = self._shift_labels(self.data[column].to_numpy())
+
+        # the labels changed, the cycle indices of the data are stale
+        self._cycle_indices = {key: index for key, index in self._cycle_indices.items() if key[1]}
 
         # set the history
         self.history['cycles_shifted'] = True
 
+    def _shift_chunk_labels(self, label_columns):
+        # every row takes the label of the row after it, across the chunk boundaries: the last row before the
+        # chunk moves into it and the last row of the chunk (unless it ends the file) into the next chunk
+        before = self._chunk['before']
+        rows = self.data if before is None else pandas.concat([before, self.data])
+        rows = rows.assign(**{column: self._shift_labels(rows[column].to_numpy()) for column in label_columns})
+
+        first = 0 if before is None else len(before) - 1
+        stop = len(rows) if self._chunk['last'] else len(rows) - 1
+        self._chunk['before'] = rows.iloc[:first] if first > 0 else None
+        self.data = rows.iloc[first:stop].copy()
+
+    def cycle_index(self, column='cycle_number', cropped=False):
+        """ CycleIndex of a label column of data (or data_cropped), built once and reused """
+        key = (column, cropped)
+        if key not in self._cycle_indices:
+            data = self.data_cropped if cropped else self.data
+            self._cycle_indices[key] = CycleIndex.from_labels(data[column].to_numpy())
+        return self._cycle_indices[key]
+
+    def get_cycle(self, cycle_number):
+        """ Extracted cycle (see extract_cycles) by its cycle number as in cycle_numbers """
+        return self._cycle_segments.slice(self._cycle_data, cycle_number)
+
+    def get_half_cycle(self, half_cycle_number):
+        """ Extracted half cycle (see extract_cycles) by its number as in half_cycle_numbers """
+        return self._half_cycle_segments.slice(self._half_cycle_data, half_cycle_number)
+
+    @instrument.stage(rows_out='_cycle_data')
     def extract_cycles(self):
         # check if ec_df has half_cycle information
         if "cycle_number" not in self.data.columns:
             raise Exception('Data does not contain cycle information')
 
-        # extract cycles in separate DataFrames
-        cycles = []
-        for cycle_number in self.data['cycle_number'].unique():
-            cycle_df = self.data[
-                # All data where half_cycle is the given value
-                self.data['cycle_number'] == cycle_number
-                ].copy()
-            cycles.append(cycle_df)
-            self.cycle_numbers.append(int(cycle_number) + 1)
-
-        # Prepend last row of previous half_cycle on current half_cycle
-        #
-        #   /\  /\        /\  /\
-        #  /  \   \  =>  /  \/  \
-        #   C1  C2        C1  C2
-        for index, cycle_df in enumerate(cycles):
-            if index > 0:
-                last_row_previous_cycle = pandas.DataFrame(cycles[index - 1].iloc[[-1]])
-                cycles[index] = pandas.concat([last_row_previous_cycle, cycle_df], ignore_index=True)
-                cycles[index].iloc[0]['cycle_number'] = cycle_df.iloc[0]['cycle_number']
-                cycles[index].iloc[0]['half_cycle'] = cycle_df.iloc[0]['half_cycle']
-
-        # Start every half_cycle from t=0 instead of the overall measurement time
-        for index, cycle_df in enumerate(cycles):
-            start_time = cycle_df.loc[cycle_df.index[0], 'time/s']
-            cycles[index]['time/s'] = cycle_df['time/s'].subtract(start_time)
+        # the first cycle of a chunk gets the row before the chunk prepended, as in the whole file
+        if self._chunk is not None and self._chunk['before'] is not None:
+            data, start = pandas.concat([self._chunk['before'].iloc[-1:], self.data]), 1
+        else:
+            data, start = None, 0
+
+        # extract cycles as views on one contiguous DataFrame
+        self.cycle_numbers, self._cycle_data, self._cycle_segments = \
+            self._extract_segments('cycle_number', start, data)
+        self.cycles = list(self._cycle_segments.slices(self._cycle_data))
 
         # repeat for half cycles
         if "half_cycle" in self.data.columns:
-            half_cycles = []
-            for half_cycle_number in self.data['half_cycle'].unique():
-                cycle_df = self.data[
-                    # All data where half_cycle is the given value
-                    self.data['half_cycle'] == half_cycle_number
-                    ].copy()
-                half_cycles.append(cycle_df)
-                self.half_cycle_numbers.append(int(half_cycle_number) + 1)
-
-            for index, cycle_df in enumerate(half_cycles):
-                if index > 0:
-                    last_row_previous_cycle = pandas.DataFrame(half_cycles[index - 1].iloc[[-1]])
-                    half_cycles[index] = pandas.concat([last_row_previous_cycle, cycle_df], ignore_index=True)
-                    half_cycles[index].iloc[0]['cycle_number'] = cycle_df.iloc[0]['cycle_number']
-                    half_cycles[index].iloc[0]['half_cycle'] = cycle_df.iloc[0]['half_cycle']
-
-            for index, cycle in enumerate(half_cycles):
-                start_time = cycle.loc[cycle.index[0], 'time/s']
-                half_cycles[index]['time/s'] = cycle['time/s'].subtract(start_time)
-
-            # save the extracted cycles as list of DataFrames
-            self.half_cycles = half_cycles
-
-        # save the extracted cycles as list of DataFrames
-        self.cycles = cycles
+            self.half_cycle_numbers, self._half_cycle_data, self._half_cycle_segments = \
+                self._extract_segments('half_cycle', start, data)
+            self.half_cycles = list(self._half_cycle_segments.slices(self._half_cycle_data))
 
         # set the history
         self.history['cycles_extracted'] = True
 
+    def _extract_segments(self, column, start=0, data=None):
+        # with start > 0 only the cycles from that row of data (default self.data) on are extracted, e.g. the tail
+        # of a live file or a chunk behind the row before it
+        data = self.data if data is None else data
+        if start == 0:
+            index = self.cycle_index(column)
+        else:
+            tail_index = CycleIndex.from_labels(data[column].to_numpy()[start:])
+            index = CycleIndex(tail_index.labels, tail_index.starts + start, tail_index.stops + start)
+        starts = index.starts
+        stops = index.stops
+
+        # Prepend last row of previous cycle on current cycle
+        #
+        #   /\  /\        /\  /\
+        #  /  \   \  =>  /  \/  \
+        #   C1  C2        C1  C2
+        prepended = starts > 0
+        first_rows = starts - prepended
+        lengths = stops - first_rows
+        offsets = np.r_[0, np.cumsum(lengths)]
+
+        # all cycles are gathered in one take, each cycle is a contiguous block indexed from 0
+        segment_start = np.repeat(offsets[:-1], lengths)
+        positions = np.repeat(first_rows, lengths) + np.arange(offsets[-1]) - segment_start
+
+        segment_data = data.iloc[positions].copy()
+        segment_data.index = np.arange(offsets[-1]) - segment_start
+
+        # the prepended row belongs to the current cycle
+        prepended_rows = offsets[:-1][prepended]
+        for label_column in ['cycle_number', 'half_cycle']:
+            if label_column in segment_data.columns:
+                label_values = segment_data[label_column].to_numpy()
+                segment_data.iloc[prepended_rows, segment_data.columns.get_loc(label_column)] = \
+                    label_values[prepended_rows + 1]
+
+        # Start every cycle from t=0 instead of the overall measurement time
+        time = segment_data['time/s'].to_numpy()
+        segment_data['time/s'] = time - time[segment_start]
+
+        numbers = [int(label) + 1 for label in index.labels]
+
+        return numbers, segment_data, CycleIndex(numbers, offsets[:-1], offsets[1:])
+
+    @instrument.stage(rows_in='_half_cycle_data', rows_out='capacitances')
     def calculate_charge_discharge_capacitances(self, **kwargs):
         if "Modulo Bat" not in self.header['file_type']:
             raise Exception('Not a Modulo Bat file')
@@ -162,130 +441,265 @@ class BiologicFile:
         self.header['charge_current'] = lm.to_float(self.header['technique'].loc['ctrl1_val', 1])
         #charge_current = lm.to_float(self.header['technique'].loc['ctrl1_val', 1])
 
-        # Calculate Charge Capacitances
-
-        self.capacitances = pandas.DataFrame(columns=['Cycle',
-                                                      'Cycle Number'
-                                                      'Current',
-                                                      'Ideal Charge Capacitance',
-                                                      'Ideal Discharge Capacitance',
-                                                      'Charge Ideality',
-                                                      'Discharge Ideality',
-                                                      'Faradayic Efficiency',
-                                                      'Discharge Polarity Gap',
-                                                      ]).set_index('Cycle')
-
-        for cycle in self.half_cycles:
-            cycle_number = int(cycle.loc[0, 'cycle_number']) + 1
-            ideal_capacitance = self._calculate_ideal_capacitance_from_halfcycle(cycle, self.header['charge_current'])
-            cycle = self._calculate_step_capacitances_from_halfcycle(cycle)
-            cycle, r_squared = self._calculate_ideality_deviation_from_halfcycle(cycle)
-            polarity_gap = cycle.loc[0, 'Ewe-Ece/V'] - cycle.loc[1, 'Ewe-Ece/V']
-
-            # Take 2nd point of current half_cycle as current indicator to see if charge or discharge
-            charge_cycle = cycle.astype(float).loc[1, 'I/mA'] > 0
-
-            if charge_cycle:
-                self.capacitances.loc[cycle_number, 'Ideal Charge Capacitance'] = ideal_capacitance
-                self.capacitances.loc[cycle_number, 'Charge Ideality'] = r_squared
+        # Calculate the step capacitances of every row, in mF as charge_current is in mA
+        half_cycle_data = self._half_cycle_data
+        half_cycle_data['step_capacitance/mF'] = self._step_capacitances(half_cycle_data, self._half_cycle_segments)
+        self.half_cycles = list(self._half_cycle_segments.slices(half_cycle_data))
 
-            if not charge_cycle:
-                self.capacitances.loc[cycle_number, 'Ideal Discharge Capacitance'] = ideal_capacitance
-                self.capacitances.loc[cycle_number, 'Discharge Ideality'] = r_squared
-                self.capacitances.loc[cycle_number, 'Discharge Polarity Gap'] = polarity_gap
-
-            self.capacitances.loc[cycle_number, 'Current'] = self.header['charge_current']
-            self.capacitances.loc[cycle_number, 'Cycle Number'] = cycle_number
-
-        self.capacitances['Faradayic Efficiency'] = \
-            self.capacitances['Ideal Discharge Capacitance'] / self.capacitances['Ideal Charge Capacitance']
+        # Calculate Charge Capacitances
+        self._half_cycle_values = self._half_cycle_capacitances(half_cycle_data, self._half_cycle_segments,
+                                                                self.header['charge_current'])
+        self.capacitances = self._capacitance_table(self._half_cycle_values, self.header['charge_current'])
 
         self.history['capacitances'] = True
 
+    @instrument.stage()
     def crop_columns_to(self, list_of_columns):
         self.data = self.data[list_of_columns]
+        if self._chunk is not None and self._chunk['before'] is not None:
+            self._chunk['before'] = self._chunk['before'][list_of_columns]
+
+    def _read_appended(self, contents):
+        # parse the complete rows of contents, a trailing partial row is left for the next poll
+        complete = contents.rfind(b'\n') + 1
+        if complete == 0:
+            return None
+
+        rows = mpt.read_data(io.BytesIO(contents[:complete]), self._live['columns'], usecols=self._live['usecols'])
+        if self._live['usecols'] is not None:
+            rows = rows[self._live['usecols']].copy()
+        if self._live['compact'] or self._live['float32']:
+            rows = mpt.compact(rows, float32=self._live['float32'])
+
+        self._live['offset'] += complete
+        return rows
+
+    def _buffer(self, attribute):
+        # the row buffer of a table, (re)filled from the table if it was replaced or modified since the last poll
+        buffer = self._live['buffers'].get(attribute)
+        frame = getattr(self, attribute)
+        if buffer is None or not buffer.holds(frame):
+            buffer = _RowBuffer(frame)
+            self._live['buffers'][attribute] = buffer
+        return buffer
+
+    def _append_rows(self, attribute, rows, keep=None, buffer=None):
+        # append rows to a table in amortized time of the rows, keep drops the table rows from that position on
+        buffer = self._buffer(attribute) if buffer is None else buffer
+        if keep is not None:
+            buffer.truncate(keep)
+        buffer.append(rows)
+        setattr(self, attribute, buffer.frame())
+
+    def _crop_appended(self, rows, arguments):
+        # continue the resolution crop from the last kept row
+        last_kept = self.data_cropped.iloc[-1] if len(self.data_cropped) else rows.iloc[0]
+        keep = self._resolution_keep_mask(np.r_[last_kept['time/s'], rows['time/s'].to_numpy()],
+                                          np.r_[last_kept['Ewe-Ece/V'], rows['Ewe-Ece/V'].to_numpy()],
+                                          arguments['delta_time'], arguments['delta_pot'])[1:]
+        if len(self.data_cropped) == 0:
+            keep[0] = True
+        return rows[keep]
+
+    def _extend_segments(self, column, first_new):
+        # the last extracted (half) cycle was still running, it is rebuilt together with the appended cycles
+        prefix = '_cycle' if column == 'cycle_number' else '_half_cycle'
+        segments = getattr(self, f"{prefix}_segments")
+        numbers = self.cycle_numbers if column == 'cycle_number' else self.half_cycle_numbers
+        views = self.cycles if column == 'cycle_number' else self.half_cycles
+
+        if len(segments) == 0:
+            # extracted while still empty, everything is extracted now
+            kept, kept_rows, tail_start = 0, 0, 0
+        else:
+            kept = len(segments) - 1
+            kept_rows = int(segments.starts[-1])
+            # data row of the start of the running cycle, every segment but the first carries a prepended row
+            tail_start = first_new - int(segments.stops[-1] - segments.starts[-1]) + (1 if kept > 0 else 0)
+
+        tail_numbers, tail_data, tail_segments = self._extract_segments(column, tail_start)
+
+        if column == 'half_cycle' and 'capacitances' in self.history:
+            tail_data['step_capacitance/mF'] = self._step_capacitances(tail_data, tail_segments)
+            self._extend_capacitances(tail_data, tail_segments)
+
+        self._append_rows(f"{prefix}_data", tail_data, keep=kept_rows)
+        segment_data = getattr(self, f"{prefix}_data")
+
+        numbers = list(numbers[:kept]) + tail_numbers
+        index = CycleIndex(numbers, np.r_[segments.starts[:kept], tail_segments.starts + kept_rows],
+                           np.r_[segments.stops[:kept], tail_segments.stops + kept_rows])
+        # the views of the complete cycles stay valid, only the rebuilt ones are sliced again
+        views = list(views[:kept]) + [segment_data.iloc[start:stop]
+                                      for start, stop in zip(index.starts[kept:], index.stops[kept:])]
+
+        setattr(self, f"{prefix}_segments", index)
+        if column == 'cycle_number':
+            self.cycle_numbers, self.cycles = numbers, views
+        else:
+            self.half_cycle_numbers, self.half_cycles = numbers, views
 
-    @staticmethod
-    def _calculate_ideal_capacitance_from_halfcycle(half_cycle, charge_current):
-        potential_start = float(half_cycle.loc[0, 'Ewe-Ece/V'])
-        time_start = float(half_cycle.loc[0, 'time/s'])
-
-        last_index = half_cycle.index[-1]
-        potential_end = float(half_cycle.loc[last_index, 'Ewe-Ece/V'])
-        time_end = float(half_cycle.loc[last_index, 'time/s'])
-
-        time_delta = time_end - time_start
-        potential_delta = abs(potential_end - potential_start)
+    def _extend_capacitances(self, tail_data, tail_segments):
+        # fit only the rebuilt half cycles, and renew the table rows of the cycles they belong to
+        tail_values = self._half_cycle_capacitances(tail_data, tail_segments, self.header['charge_current'])
+        self._half_cycle_values = pandas.concat([self._half_cycle_values.iloc[:-1], tail_values], ignore_index=True)
 
-        # charge_current is in mA --> capacitance is in mF (should be identical to current / slope)
-        capacitance = (charge_current * time_delta) / potential_delta
+        affected = pandas.unique(tail_values['cycle_number'])
+        values = self._half_cycle_values
+        rows = self._capacitance_table(values[values['cycle_number'].isin(affected)], self.header['charge_current'])
+        self.capacitances = pandas.concat([self.capacitances.drop(rows.index, errors='ignore'), rows])
 
-        return capacitance
+    @staticmethod
+    def _shift_labels(labels):
+        shifted = labels.copy()
+        shifted[:-1] = labels[1:]
+        return shifted
 
     @staticmethod
-    def _calculate_step_capacitances_from_halfcycle(half_cycle):
-        half_cycle['E_delta/V'] = half_cycle['Ewe-Ece/V'].diff()
-        half_cycle['time_delta/s'] = half_cycle['time/s'].diff()
-        half_cycle['step_capacitance/mF'] = half_cycle['I/mA'] * half_cycle['time_delta/s'] / half_cycle['E_delta/V']
+    def _resolution_keep_mask(time, potential, delta_time, delta_pot):
+        # A row is dropped if both |dt| < delta_time and |dE| < delta_pot relative to the last kept row.
+        # The rule is sequential, so the rows are walked once as plain python floats, which is much cheaper
+        # per row than numpy scalar access or a numpy call per kept row.
+        keep = [False] * len(time)
+        if len(keep) == 0:
+            return np.zeros(0, dtype=bool)
+
+        time = time.tolist()
+        potential = potential.tolist()
+
+        keep[0] = True
+        compare_time = time[0]
+        compare_pot = potential[0]
+        for index in range(1, len(keep)):
+            current_time = time[index]
+            current_pot = potential[index]
+            if abs(current_time - compare_time) < delta_time and abs(current_pot - compare_pot) < delta_pot:
+                continue
+            keep[index] = True
+            compare_time = current_time
+            compare_pot = current_pot
 
-        # charge_current is in mA --> capacitance is in mF
-        return half_cycle
+        return np.array(keep, dtype=bool)
 
     @staticmethod
-    def _calculate_ideality_deviation_from_halfcycle(half_cycle):
-        potential_start = float(half_cycle.loc[0, 'Ewe-Ece/V'])
-        time_start = float(half_cycle.loc[0, 'time/s'])
+    def _step_capacitances(half_cycle_data, segments):
+        # charge between two rows over their potential difference, NaN at the first row of every half cycle
+        potential = half_cycle_data['Ewe-Ece/V'].to_numpy()
+        time = half_cycle_data['time/s'].to_numpy()
+        current = half_cycle_data['I/mA'].to_numpy()
+        step_capacitance = np.full(len(time), np.nan)
+        # rows without a potential change (resting, or equal after rounding) are +-inf or NaN
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step_capacitance[1:] = current[1:] * np.diff(time) / np.diff(potential)
+        step_capacitance[segments.starts] = np.nan
+        return step_capacitance
 
-        last_index = half_cycle.index[-1]
-        potential_end = float(half_cycle.loc[last_index, 'Ewe-Ece/V'])
-        time_end = float(half_cycle.loc[last_index, 'time/s'])
+    @staticmethod
+    def _capacitance_table(half_cycle_values, charge_current):
+        # Cycles in order of appearance, a later half cycle of the same cycle and polarity takes precedence
+        cycle_numbers = pandas.unique(half_cycle_values['cycle_number'])
+        charge = half_cycle_values[half_cycle_values['charge']] \
+            .drop_duplicates('cycle_number', keep='last').set_index('cycle_number')
+        discharge = half_cycle_values[~half_cycle_values['charge']] \
+            .drop_duplicates('cycle_number', keep='last').set_index('cycle_number')
+
+        capacitances = pandas.DataFrame({
+            'Cycle Number': cycle_numbers,
+            'Current': charge_current,
+        }, index=pandas.Index(cycle_numbers, name='Cycle'))
+        capacitances['Ideal Charge Capacitance'] = charge['ideal_capacitance']
+        capacitances['Ideal Discharge Capacitance'] = discharge['ideal_capacitance']
+        capacitances['Charge Ideality'] = charge['r_squared']
+        capacitances['Discharge Ideality'] = discharge['r_squared']
+        capacitances['Faradayic Efficiency'] = \
+            capacitances['Ideal Discharge Capacitance'] / capacitances['Ideal Charge Capacitance']
+        capacitances['Discharge Polarity Gap'] = discharge['polarity_gap']
+
+        return capacitances
 
-        time_delta = time_end - time_start
-        potential_delta = potential_end - potential_start
+    @staticmethod
+    def _half_cycle_capacitances(half_cycle_data, segments, charge_current):
+        # Reduce every half cycle of the contiguous half cycle data at once
+        potential = half_cycle_data['Ewe-Ece/V'].to_numpy()
+        time = half_cycle_data['time/s'].to_numpy()
+        current = half_cycle_data['I/mA'].to_numpy()
+
+        first = segments.starts
+        last = segments.stops - 1
+        lengths = segments.stops - segments.starts
+        # the 2nd point of a half cycle, a (running) half cycle of a single row only has its first
+        second = np.minimum(first + 1, last)
+
+        if len(first) == 0:
+            return pandas.DataFrame({'cycle_number': np.empty(0, dtype=int), 'charge': np.empty(0, dtype=bool),
+                                     'ideal_capacitance': np.empty(0), 'r_squared': np.empty(0),
+                                     'polarity_gap': np.empty(0)})
+
+        time_delta = time[last] - time[first]
+        potential_delta = potential[last] - potential[first]
+
+        # a half cycle of a single row has no fit, its values are NaN
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # charge_current is in mA --> capacitance is in mF (should be identical to current / slope)
+            ideal_capacitance = (charge_current * time_delta) / np.abs(potential_delta)
+
+            # deviation from the ideal linear potential course between the first and last point
+            slope = potential_delta / time_delta  # in V / s
+            intercept = potential[last] - (slope * time[last])  # in V
+            ideal_potential = np.repeat(intercept, lengths) + np.repeat(slope, lengths) * time
+            residuals_squared_sum = np.add.reduceat((potential - ideal_potential) ** 2, first)
+            value_mean = np.add.reduceat(potential, first) / lengths
+            values_squared_sum = np.add.reduceat((potential - np.repeat(value_mean, lengths)) ** 2, first)
+            r_squared = 1 - (residuals_squared_sum / values_squared_sum)
+
+        return pandas.DataFrame({
+            'cycle_number': half_cycle_data['cycle_number'].to_numpy()[first].astype(int) + 1,
+            # Take 2nd point of current half_cycle as current indicator to see if charge or discharge
+            'charge': current[second] > 0,
+            'ideal_capacitance': ideal_capacitance,
+            'r_squared': r_squared,
+            'polarity_gap': potential[first] - potential[second],
+        })
 
-        # slope in V / s
-        slope = potential_delta / time_delta
+    @staticmethod
+    def _load_mpt(path, usecols=None):
+        with open(path, 'rb') as file:
+            header_object, columns = BiologicFile._read_header(file)
 
-        # intercept in V
-        intercept = potential_end - (slope * time_end)
+            # Extract EC Data, unwanted columns are skipped by the tokenizer and never materialized
+            ec_df = mpt.read_data(file, columns, usecols=usecols)
 
-        half_cycle['ideal_potential'] = intercept + slope * half_cycle['time/s']
-        half_cycle['residual-squared'] = (half_cycle['Ewe-Ece/V'] - half_cycle['ideal_potential']) ** 2
-        residuals_squared_sum = half_cycle['residual-squared'].sum()
-        value_mean = half_cycle['Ewe-Ece/V'].mean()
-        half_cycle['values-squared'] = (half_cycle['Ewe-Ece/V'] - value_mean) ** 2
-        values_squared_sum = half_cycle['values-squared'].sum()
-        r_squared = 1 - (residuals_squared_sum / values_squared_sum)
+        if usecols is not None:
+            ec_df = ec_df[usecols]
 
-        return half_cycle, r_squared
+        return header_object, ec_df, {'mpt': True}
 
     @staticmethod
-    def _load_mpt(path):
-        file_contents = open(path).readlines()
+    def _read_header(file, live=False):
+        # live=True accepts the header of a running measurement, the format check only warns
+        file_contents = mpt.read_header_lines(file)
+        header_lines = len(file_contents)
 
         ## Handle Header ##
 
-        # check if ASCII file
-        if not "EC-Lab ASCII FILE" in file_contents[0]:
-            raise Exception('Only EC-Lab ASCII Files supported')
-
         # check if lines 2 and 4 are empty
+        unexpected_format = 'Unexpected EC-Lab ASCII File format (line 2 and 4 are non empty).'
         if len(file_contents[2]) > 1:
-            raise Exception(
-                'Unexpected EC-Lab ASCII File format (line 2 and 4 are non empty). File copied before measurement was finished?')
+            if not live:
+                raise Exception(f"{unexpected_format} File copied before measurement was finished?")
+            warnings.warn(f"{unexpected_format} Reading the running measurement anyway")
 
         if len(file_contents[4]) > 1:
             if file_contents[3][:-1] == 'DISK CHANNEL SETTING':
                 file_type = 'RRDE'
+            elif live:
+                warnings.warn(f"{unexpected_format} Reading the running measurement anyway")
+                file_type = file_contents[3][:-1]
             else:
-                raise Exception(
-                    'Unexpected EC-Lab ASCII File format (line 2 and 4 are non empty). File copied before measurement was finished?')
+                raise Exception(f"{unexpected_format} File copied before measurement was finished?")
         else:
             file_type = file_contents[3][:-1]
 
-        # extract number of header lines from file
-        header_lines = int(re.findall('Nb header lines : ([0-9]+)', file_contents[1])[0])
-
         # slice header off file
         header = file_contents[5:(header_lines - 1)]
 
@@ -338,15 +752,68 @@ class BiologicFile:
         technique_df = technique_df.set_index([0])
         technique_df = technique_df.replace(',', '.', regex=True)
 
-        # Extract EC Data
-
-        ec_data = list(map(lambda el: el.split('\t'), file_contents[header_lines:]))
-        ec_df = pandas.DataFrame(ec_data)
-        ec_df.columns = file_contents[header_lines - 1].replace(' ', '_').split('\t')[:-1]
-        ec_df = ec_df.replace(',', '.', regex=True)
-        ec_df = ec_df.astype(np.float64)
-
         header_object['flags'] = flags
         header_object['technique'] = technique_df
 
-        return header_object, ec_df, {'mpt': True}
+        columns = [column.replace(' ', '_') for column in mpt.column_names(file_contents)]
+
+        return header_object, columns
+
+
+class _RowBuffer:
+    """ Columns of a table in preallocated arrays, so that appending rows only costs the new rows (amortized) """
+
+    def __init__(self, frame):
+        self.length = len(frame)
+        capacity = max(1024, 2 * self.length)
+
+        self.arrays = {column: self._allocate(frame[column].to_numpy(), capacity) for column in frame.columns}
+        # a default range index is not stored
+        self.index = None
+        if not (isinstance(frame.index, pandas.RangeIndex) and frame.index.start == 0 and frame.index.step == 1):
+            self.index = self._allocate(frame.index.to_numpy(), capacity)
+
+    def holds(self, frame):
+        # frame is still the last frame() (no column was replaced or added since)
+        return len(frame) == self.length and list(frame.columns) == list(self.arrays) and all(
+            np.may_share_memory(frame[column].to_numpy(), array) for column, array in self.arrays.items())
+
+    def truncate(self, length):
+        self.length = min(length, self.length)
+
+    def append(self, rows):
+        needed = self.length + len(rows)
+        stop = self.length
+
+        for column, array in list(self.arrays.items()):
+            values = rows[column].to_numpy()
+            # e.g. a counter that does not fit its compact dtype anymore is promoted to float64
+            dtype = np.result_type(values.dtype, array.dtype)
+            if len(array) < needed or dtype != array.dtype:
+                array = self._allocate(array[:stop].astype(dtype), max(2 * len(array), needed))
+                self.arrays[column] = array
+            array[stop:needed] = values
+
+        # rows that do not continue the default range index (e.g. cropped rows) need the index stored from now on
+        if self.index is None and not (isinstance(rows.index, pandas.RangeIndex) and rows.index.start == stop and
+                                       rows.index.step == 1):
+            self.index = self._allocate(np.arange(stop), max(2 * stop, needed))
+
+        if self.index is not None:
+            if len(self.index) < needed:
+                self.index = self._allocate(self.index[:stop], max(2 * len(self.index), needed))
+            self.index[stop:needed] = rows.index.to_numpy()
+
+        self.length = needed
+
+    def frame(self):
+        frame = pandas.DataFrame({column: array[:self.length] for column, array in self.arrays.items()}, copy=False)
+        if self.index is not None:
+            frame.index = pandas.Index(self.index[:self.length], copy=False)
+        return frame
+
+    @staticmethod
+    def _allocate(values, capacity):
+        array = np.empty(max(capacity, len(values)), dtype=values.dtype)
+        array[:len(values)] = values
+        return array
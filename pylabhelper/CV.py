@@ -2,70 +2,111 @@ import os.path
 import pylabhelper.biologic as biologic
 import numpy as np
 import pylabhelper.math as lm
+from pylabhelper.cycles import CycleIndex
 import pandas as pd
-import scipy.signal as sp_sig
 from datetime import datetime
+from functools import cached_property
+
+# category order of the direction columns, the int8 codes are stored
+DIRECTIONS = ['up', 'down']
+
+# a vertex is accepted once the potential moved back by this fraction of the vertex span
+VERTEX_HYSTERESIS = 0.1
 
 
 class CV:
 
-    def __init__(self, path):
-        """ Creating a CV object from a measurement file """
+    def __init__(self, path, resolution=0.001, interpolation_method='interp1d'):
+        """ Creating a CV object from a measurement file
+
+        Only the header is read here, the measured, recycled and interpolated data are computed on first access.
+        The interpolated data is resampled onto a potential grid with a spacing of resolution (in V)."""
 
         self.path = path
+        self.resolution = resolution
+        self.interpolation_method = interpolation_method
         self.filename, self.extension = os.path.splitext(os.path.basename(path))
 
         if self.extension == '.mpt':
-            data = biologic.read_mpt(path)
+            header = biologic.read_mpt_header(path)
+
+            self.start_vertice = header['start_vertice']
+            self.first_vertice = header['first_vertice']
+            self.second_vertice = header['second_vertice']
+            self.final_vertice = header['final_vertice']
+            self.speed = header['speed']
+            self.acquisition_timestamp = header['timestamp']
+
+    @cached_property
+    def _measurement(self):
+        return biologic.read_mpt(self.path)
+
+    @cached_property
+    def original_data(self):
+        return self._measurement['data']
+
+    @cached_property
+    def ocp(self):
+        return self._measurement['open_circuit_potential']
+
+    @cached_property
+    def _recycled(self):
+        return self._create_recycled_data()
+
+    @property
+    def data(self):
+        return self._recycled[0]
 
-            self.start_vertice = data['start_vertice']
-            self.first_vertice = data['first_vertice']
-            self.second_vertice = data['second_vertice']
-            self.final_vertice = data['final_vertice']
-            self.speed = data['speed']
-            self.ocp = data['open_circuit_potential']
-            self.original_data = data['data']
+    @property
+    def cycle_count(self):
+        return self._recycled[1]
 
-            self.data, self.cycle_count = self._create_recycled_data()
-            self.original_cycle_count = len(self.original_data.cycle.unique())
-            self.interp_data = self._create_interpolated_data()
+    @property
+    def _cycle_index(self):
+        return self._recycled[2]
 
-            self.timestamp = data['timestamp'] + self.data['time'][0]
-            self.datetime = datetime.fromtimestamp(self.timestamp).strftime("%d-%m-%Y %H:%M:%S")
+    @cached_property
+    def _original_cycle_index(self):
+        return CycleIndex.from_labels(self.original_data.half_cycle.to_numpy())
+
+    @property
+    def original_cycle_count(self):
+        return len(self._original_cycle_index)
+
+    @cached_property
+    def _interpolated(self):
+        return self._create_interpolated_data()
+
+    @property
+    def interp_data(self):
+        return self._interpolated[0]
+
+    @property
+    def _interp_cycle_index(self):
+        return self._interpolated[1]
+
+    @cached_property
+    def timestamp(self):
+        return self.acquisition_timestamp + self.original_data['time'][0]
+
+    @cached_property
+    def datetime(self):
+        return datetime.fromtimestamp(self.timestamp).strftime("%d-%m-%Y %H:%M:%S")
 
     def _extract_cycle_keys(self):
-        fv = self.first_vertice
-        sv = self.second_vertice
-        th = abs(fv - sv) * 0.01
-
-        max_keys, _ = sp_sig.find_peaks(self.original_data.potential,
-                                        height=(fv - th, fv + th),
-                                        distance=10, width=10)
-        min_keys, _ = sp_sig.find_peaks(self.original_data.potential * (-1),
-                                        height=(-(sv + th), -(sv - th)),
-                                        distance=10, width=10)
-
-        # for cycle_number in self.original_data.half_cycle.unique():
-        #     if self.first_vertice > self.second_vertice:
-        #         # Cycle is upper - lower - upper
-        #         cycle_df = self.original_data[self.original_data.half_cycle == cycle_number]
-        #         max_keys.append(cycle_df.potential.idxmax())
+        # Possibility 1      Possibility 2          Possibility 3
+        # EOC in between     EOC smaller than L     EOC bigger than U
+        #                                            S          E
+        #                                            \          /
+        #  U1  U2  U3         U1  U2  U3              \U1  U2  /U3
+        #  /\  /\  /\         /\  /\  /\               \  /\  /
+        #  S \/  \/ E        /  \/  \/  \               \/  \/
+        #    L1  L2         /   L1  L2   \              L1  L2
+        #  ____----         S            E
         #
-        #         # Possibility 1      Possibility 2          Possibility 3
-        #         # EOC in between     EOC smaller than L     EOC bigger than U
-        #         #                                            S          E
-        #         #                                            \          /
-        #         #  U1  U2  U3         U1  U2  U3              \U1  U2  /U3
-        #         #  /\  /\  /\         /\  /\  /\               \  /\  /
-        #         #  S \/  \/ E        /  \/  \/  \               \/  \/
-        #         #    L1  L2         /   L1  L2   \              L1  L2
-        #         #  ____----         S            E
-        #
-        #         # ignore data before first maximum
-        #         min_keys.append(cycle_df.loc[cycle_df.potential.idxmax():].potential.idxmin())
-        #     else:
-        #         # Cycle is lower - upper - lower
-        #         raise Exception(f"direction not yet defined FV {self.first_vertice} SV {self.second_vertice}")
+        # Start and end are never vertices, the same holds mirrored for lower - upper - lower cycles
+        hysteresis = abs(self.first_vertice - self.second_vertice) * VERTEX_HYSTERESIS
+        max_keys, min_keys = lm.turning_points(self.original_data.potential.to_numpy(), hysteresis)
 
         return [list(max_keys), list(min_keys)]
 
@@ -73,95 +114,94 @@ class CV:
         max_keys, min_keys = self._extract_cycle_keys()
         data = self.original_data.copy()
 
-        if max_keys[0] > min_keys[0]:
-            min_keys.pop(0)
+        max_keys = np.asarray(max_keys, dtype=np.int64)
+        min_keys = np.asarray(min_keys, dtype=np.int64)
+        positions = np.arange(len(data))
 
-        data.loc[0: max_keys[0], 'half_cycle'] = 'start'
-        data.loc[0: max_keys[0], 'direction'] = 'up'
-        for max_key_index in range(len(max_keys) - 1):
-            data.loc[max_keys[max_key_index]: max_keys[max_key_index + 1], 'half_cycle'] = max_key_index + 1
-            data.loc[max_keys[max_key_index]: min_keys[max_key_index], 'direction'] = 'down'
-            data.loc[min_keys[max_key_index]: max_keys[max_key_index + 1], 'direction'] = 'up'
+        # Cycles run from one first vertex to the next (upper vertices for upper - lower - upper cycles, lower ones
+        # otherwise): cycle 0 is the start up to the first of these vertices and the last cycle is the end after them
+        cycle_keys = max_keys if self.first_vertice > self.second_vertice else min_keys
+        data['cycle'] = np.searchsorted(cycle_keys, positions, side='right').astype(np.int32)
 
-        data.loc[max_keys[-1]:, 'half_cycle'] = 'end'
-        data.loc[max_keys[-1]:min_keys[-1], 'direction'] = 'down'
-        data.loc[min_keys[-1]:, 'direction'] = 'up'
+        # The scan direction is down after an upper vertex and up after a lower vertex,
+        # before the first vertex it runs towards that vertex
+        vertex_keys = np.concatenate([max_keys, min_keys])
+        order = np.argsort(vertex_keys, kind='stable')
+        is_upper = np.concatenate([np.ones(len(max_keys), dtype=bool), np.zeros(len(min_keys), dtype=bool)])[order]
+        first_is_upper = is_upper[0] if len(is_upper) else self.first_vertice > self.second_vertice
+        down = np.r_[not first_is_upper, is_upper][np.searchsorted(vertex_keys[order], positions, side='right')]
+        data['direction'] = pd.Categorical.from_codes(down.astype(np.int8), categories=DIRECTIONS)
 
-        return data, (len(max_keys)-1)
+        # row ranges of every cycle, including start and end
+        return data, (len(cycle_keys)-1), CycleIndex.from_boundaries(cycle_keys, len(data))
 
     def _create_interpolated_data(self):
-        # Prepare the cycles list for return
-        cycles_df = []
-
-        if self.first_vertice > self.second_vertice:
-            # First extreme is upper vertex
-            # --> Cycle is upper - lower - upper
-            #TODO: resolution and method as option value from UI!!!
-            resolution = 0.001
-            interpolation_method = 'interp1d'
-
-            interp_potential_down = np.linspace(self.first_vertice, self.second_vertice,
-                                                round((self.first_vertice - self.second_vertice) / resolution) + 1)
-            interp_potential_up = np.flipud(interp_potential_down)
-
-            for cycle_number in self.data.cycle.unique()[1:-1]:
-                cycle = self.data[self.data.cycle == cycle_number]
-
-                down = cycle[cycle.direction == 'down']
-                down = down.drop_duplicates(subset='potential', keep='last')
-
-                up = cycle[cycle.direction == 'up']
-                up = up.drop_duplicates(subset='potential', keep='last')
-
-                down = down.sort_values(by=['potential'])
-                up = up.sort_values(by=['potential'])
-
-                interp_current_down = lm.interpolate(down.potential, down.current, interp_potential_down,
-                                                     method=interpolation_method)
-                interp_current_up = lm.interpolate(up.potential, up.current, interp_potential_up,
-                                                   method=interpolation_method)
-
-                interp_down = {
-                    'potential': interp_potential_down,
-                    'current': interp_current_down,
-                    'direction': 'down',
-                    'half_cycle': cycle_number
-                }
-                interp_up = {
-                    'potential': interp_potential_up,
-                    'current': interp_current_up,
-                    'direction': 'up',
-                    'half_cycle': cycle_number
-                }
-
-                # Append to the cycles list
-                cycles_df.append(pd.DataFrame(interp_down))
-                cycles_df.append(pd.DataFrame(interp_up))
-        else:
-            # First extreme is lower vertex
-            # --> Cycle is lower - upper - lower
-            raise Exception('direction yet unimplemented')
-
-        return pd.concat(cycles_df).reset_index(drop=True)
+        # Cycles are upper - lower - upper (first branch down) if the first vertex is the upper one,
+        # otherwise lower - upper - lower (first branch up)
+        first_direction, second_direction = ['down', 'up'] if self.first_vertice > self.second_vertice else ['up', 'down']
+
+        resolution = self.resolution
+        interpolation_method = self.interpolation_method
+
+        interp_potential_first = np.linspace(self.first_vertice, self.second_vertice,
+                                             round(abs(self.first_vertice - self.second_vertice) / resolution) + 1)
+        interp_potential_second = np.flipud(interp_potential_first)
+
+        # the grids are prepared once for all cycles
+        resample_first = lm.Resampler(interp_potential_first, method=interpolation_method)
+        resample_second = lm.Resampler(interp_potential_second, method=interpolation_method)
+
+        cycle_numbers = np.arange(1, self.cycle_count + 1)
+        potential = self.data.potential.to_numpy()
+        current = self.data.current.to_numpy()
+        first = self.data.direction.cat.codes.to_numpy() == DIRECTIONS.index(first_direction)
+
+        first_branches = []
+        second_branches = []
+        for cycle_number in cycle_numbers:
+            start, stop = self._cycle_index.range(cycle_number)
+            cycle_first = first[start:stop]
+
+            first_branches.append((potential[start:stop][cycle_first], current[start:stop][cycle_first]))
+            second_branches.append((potential[start:stop][~cycle_first], current[start:stop][~cycle_first]))
+
+        interp_current_first = resample_first.resample_many(first_branches)
+        interp_current_second = resample_second.resample_many(second_branches)
+
+        # every cycle is stored as first branch followed by second branch
+        grid_points = len(interp_potential_first)
+        interp_data = pd.DataFrame({
+            'potential': np.tile(np.concatenate([interp_potential_first, interp_potential_second]), len(cycle_numbers)),
+            'current': np.hstack([interp_current_first, interp_current_second]).ravel(),
+            'direction': pd.Categorical.from_codes(
+                np.tile(np.repeat(np.array([DIRECTIONS.index(first_direction), DIRECTIONS.index(second_direction)],
+                                           dtype=np.int8), grid_points), len(cycle_numbers)),
+                categories=DIRECTIONS),
+            'half_cycle': np.repeat(cycle_numbers, 2 * grid_points).astype(np.int32),
+        })
+        interp_index = CycleIndex(cycle_numbers,
+                                  (cycle_numbers - 1) * 2 * grid_points,
+                                  cycle_numbers * 2 * grid_points)
+
+        return interp_data, interp_index
 
     def get_cycle(self, cycle_number):
-        return self.data[self.data.cycle == cycle_number]
+        return self._cycle_index.slice(self.data, cycle_number)
 
     def cycles(self):
         for cycle_number in range(1, self.cycle_count + 1):
             yield self.get_cycle(cycle_number)
 
     def get_original_cycle(self, cycle_number):
-        return self.original_data[self.original_data.cycle == cycle_number]
+        return self._original_cycle_index.slice(self.original_data, cycle_number)
 
     def original_cycles(self):
         for cycle_number in range(1, self.original_cycle_count + 1):
             yield self.get_original_cycle(cycle_number)
 
     def get_interpolated_cycle(self, cycle_number):
-        return self.interp_data[self.interp_data.cycle == cycle_number]
+        return self._interp_cycle_index.slice(self.interp_data, cycle_number)
 
     def interpolated_cycles(self):
         for cycle_number in range(1, self.cycle_count + 1):
             yield self.get_interpolated_cycle(cycle_number)
-
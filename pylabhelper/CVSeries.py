@@ -0,0 +1,164 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pylabhelper.math as lm
+from pylabhelper import instrument
+from pylabhelper.CV import CV, DIRECTIONS
+
+
+class CVSeries:
+
+    def __init__(self, paths, resolution=0.001, interpolation_method='interp1d', workers=None, keep_data=False):
+        """ Creating a series of CV measurements at different scan rates
+
+        All files are loaded and interpolated in a process pool onto one shared potential grid. The currents are
+        stored in one contiguous array indexed [speed, cycle, direction, grid point]:
+            speeds     scan rates in ascending order, paths in the same order
+            cycles     cycle numbers 1 .. cycle_count, files with more cycles are cut to the shortest one
+            direction  in the order of DIRECTIONS ('up', 'down')
+            potential  the ascending grid, shared by both directions
+
+        workers defaults to the number of cores, workers=1 loads everything in the current process.
+        With keep_data=True the workers also send back the recycled data of every file, data is then the list of
+        these DataFrames in the order of speeds (otherwise None)."""
+
+        arguments = ([resolution] * len(paths), [interpolation_method] * len(paths), [keep_data] * len(paths))
+        if workers == 1:
+            measurements = instrument.track(map(_interpolated_currents, paths, *arguments), 'CVSeries', len(paths))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                measurements = instrument.track(pool.map(_interpolated_currents, paths, *arguments), 'CVSeries',
+                                                len(paths))
+
+        if len(measurements) == 0:
+            raise Exception('A series needs at least one measurement')
+
+        vertices = {(round(measurement['lower'], 9), round(measurement['upper'], 9)) for measurement in measurements}
+        if len(vertices) > 1:
+            raise Exception(f"All measurements of a series need the same vertices, found {sorted(vertices)}")
+
+        measurements.sort(key=lambda measurement: measurement['speed'])
+
+        self.paths = [measurement['path'] for measurement in measurements]
+        self.speeds = np.array([measurement['speed'] for measurement in measurements], dtype=np.float64)
+        self.potential = measurements[0]['potential']
+        self.data = [measurement['data'] for measurement in measurements] if keep_data else None
+
+        self.cycle_count = min(len(measurement['currents']) for measurement in measurements)
+        if self.cycle_count == 0:
+            raise Exception('Measurement without complete cycles in series')
+        self.cycle_numbers = np.arange(1, self.cycle_count + 1)
+
+        self.currents = np.empty((len(measurements), self.cycle_count, len(DIRECTIONS), len(self.potential)))
+        for speed_index, measurement in enumerate(measurements):
+            self.currents[speed_index] = measurement['currents'][:self.cycle_count]
+
+    def get_cycle(self, cycle_number):
+        """ Currents of one cycle of all speeds, indexed [speed, direction, grid point] """
+        return self.currents[:, self._cycle_index(cycle_number)]
+
+    def to_frame(self):
+        """ Long table with one current column per speed, every cycle as continuous trace of its branches """
+        # up branches run along the ascending grid, down branches along the descending one
+        order = {'up': slice(None), 'down': slice(None, None, -1)}
+        traces = np.stack([self.currents[:, :, index, order[direction]] for index, direction in enumerate(DIRECTIONS)],
+                          axis=2)
+
+        frame = pd.DataFrame({
+            'cycle': np.repeat(self.cycle_numbers, len(DIRECTIONS) * len(self.potential)),
+            'potential': np.tile(np.concatenate([self.potential[order[direction]] for direction in DIRECTIONS]),
+                                 self.cycle_count),
+        })
+        speed_columns = pd.DataFrame(traces.reshape(len(self.speeds), -1).T, columns=list(self.speeds))
+        return pd.concat([frame, speed_columns], axis=1)
+
+    def dunn(self, cycle_number, cutoff=None):
+        """ Separation into capacitive (k1 * v) and diffusion limited (k2 * v^1/2) current after Dunn
+
+        Fits i / v^1/2 = k1 * v^1/2 + k2 at every potential of both directions, using the speeds [:cutoff]."""
+        root_speeds = np.sqrt(self.speeds[:cutoff])
+        currents = self.get_cycle(cycle_number)[:cutoff]
+
+        values = (currents / root_speeds.reshape((-1, 1, 1))).reshape(len(root_speeds), -1)
+        faradayic, capacitive, rSq = lm.linear_regression(root_speeds, values)
+
+        return self._potential_frame(faradayic=faradayic, capacitive=capacitive, rSq=rSq)
+
+    def b_values(self, cycle_number, cutoff=None):
+        """ Exponent b of the power law i = a * v^b at every potential of both directions
+
+        b is about 1 for capacitive and 0.5 for diffusion limited currents, the speeds [:cutoff] are used."""
+        currents = np.abs(self.get_cycle(cycle_number)[:cutoff]).reshape(len(self.speeds[:cutoff]), -1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_a, b, rSq = lm.linear_regression(np.log10(self.speeds[:cutoff]), np.log10(currents))
+
+        return self._potential_frame(b=b, a=np.power(10, log_a), rSq=rSq)
+
+    def voltammetric_charges(self):
+        """ Charge of every branch, |integral of i dE| / v, indexed [speed, cycle, direction] """
+        # trapezoidal rule along the grid for all branches at once
+        mean_currents = (self.currents[..., 1:] + self.currents[..., :-1]) / 2
+        integrals = np.abs(np.sum(mean_currents * np.diff(self.potential), axis=-1))
+        return integrals / self.speeds.reshape((-1, 1, 1))
+
+    def trasatti(self, cutoff=None):
+        """ Outer, total and inner voltammetric charge of every cycle and direction after Trasatti
+
+        The outer charge is extrapolated to infinite speed from q over v^-1/2, the total charge to zero speed
+        from 1/q over v^1/2, the inner charge is their difference. The speeds [:cutoff] are used."""
+        speeds = self.speeds[:cutoff]
+        charges = self.voltammetric_charges()[:cutoff].reshape(len(speeds), -1)
+
+        outer, _, outer_rSq = lm.linear_regression(np.power(speeds, -1/2), charges)
+        inverse_total, _, total_rSq = lm.linear_regression(np.power(speeds, 1/2), 1 / charges)
+        total = 1 / inverse_total
+
+        return pd.DataFrame({
+            'cycle': np.repeat(self.cycle_numbers, len(DIRECTIONS)),
+            'direction': pd.Categorical(np.tile(DIRECTIONS, self.cycle_count), categories=DIRECTIONS),
+            'outer_charge': outer,
+            'total_charge': total,
+            'inner_charge': total - outer,
+            'outer_rSq': outer_rSq,
+            'total_rSq': total_rSq,
+        })
+
+    def _cycle_index(self, cycle_number):
+        if cycle_number not in self.cycle_numbers:
+            raise Exception(f"Cycle {cycle_number} not in series, cycles are 1 to {self.cycle_count}")
+        return cycle_number - 1
+
+    def _potential_frame(self, **values):
+        # one row per direction and grid point, in the order of the flattened [direction, grid point] axes
+        return pd.DataFrame(dict({
+            'potential': np.tile(self.potential, len(DIRECTIONS)),
+            'direction': pd.Categorical(np.repeat(DIRECTIONS, len(self.potential)), categories=DIRECTIONS),
+        }, **values))
+
+
+def _interpolated_currents(path, resolution, interpolation_method, keep_data):
+    # runs in the worker processes, only the interpolated currents (and with keep_data the recycled data) are sent back
+    cv = CV(path, resolution=resolution, interpolation_method=interpolation_method)
+
+    grid_points = round(abs(cv.first_vertice - cv.second_vertice) / resolution) + 1
+    branches = cv.interp_data.current.to_numpy().reshape(cv.cycle_count, 2, grid_points)
+
+    # the first branch runs from the first to the second vertex, up branches are ascending, down branches descending
+    first_direction, second_direction = ['down', 'up'] if cv.first_vertice > cv.second_vertice else ['up', 'down']
+    by_direction = {first_direction: branches[:, 0], second_direction: branches[:, 1]}
+    currents = np.stack([by_direction[direction] if direction == 'up' else by_direction[direction][:, ::-1]
+                         for direction in DIRECTIONS], axis=1)
+
+    lower = min(cv.first_vertice, cv.second_vertice)
+    upper = max(cv.first_vertice, cv.second_vertice)
+
+    return {
+        'path': path,
+        'speed': cv.speed,
+        'lower': lower,
+        'upper': upper,
+        'potential': np.linspace(lower, upper, grid_points),
+        'currents': currents,
+        'data': cv.data if keep_data else None,
+    }
@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import numpy as np
+import os
+import re
+from pylabhelper import instrument
+
+# sections of a BET report start with a '== <name> ==' line
+SECTION_PATTERN = re.compile(r'^== (.+?) ==((?:\r?\n(?!== ).*)*)', re.M)
+
+# numeric rows of the sections, rows of any other shape (titles, column headers) are skipped
+ISOTHERM_ROW_PATTERN = re.compile(r'^\ *(\S+ +\S+)\s*$', re.M)
+PORE_SIZE_ROW_PATTERN = re.compile(r'^\ *((?:[0-9\-\+\.e]+ +){4}[0-9\-\+\.e]+)\s*$', re.M)
+
+PORE_SIZE_COLUMNS = ['width', 'Vol', 'Surf', 'dVol', 'dSurf']
+
+
+def read_bet(path):
+    """Parse the isotherm and the pore size distribution of a BET report.
+
+    Returns a dict with path and filename and, if the sections are present,
+        'isotherm':  {'adsorption': {'pres', 'vol'}, 'desorption': {'pres', 'vol'}}
+        'pore-size': {'width', 'Vol', 'Surf', 'dVol', 'dSurf'}
+    with every value as numpy array."""
+    file_contents = open(path).read()
+
+    data = {
+        'path': os.path.dirname(path),
+        'filename': os.path.basename(path)
+    }
+
+    for name, body in SECTION_PATTERN.findall(file_contents):
+
+        # == Isotherm ==
+        if name == 'Isotherm':
+            pressure, volume = _decode_rows(ISOTHERM_ROW_PATTERN.findall(body), 2)
+            split = _desorption_start(pressure)
+
+            data['isotherm'] = {
+                'adsorption': {
+                    'pres': pressure[:split],
+                    'vol': volume[:split]
+                },
+                'desorption': {
+                    'pres': pressure[split:],
+                    'vol': volume[split:]
+                }
+            }
+
+        # == ^G Pore Size Distribution ==
+        if name == '^G Pore Size Distribution':
+            columns = _decode_rows(PORE_SIZE_ROW_PATTERN.findall(body), len(PORE_SIZE_COLUMNS))
+            data['pore-size'] = dict(zip(PORE_SIZE_COLUMNS, columns))
+
+    return data
+
+
+def read_bet_folder(directory, pattern='*.txt', workers=None):
+    """Parse all BET reports in directory matching pattern in a process pool, returns a dict of filename -> data.
+
+    workers defaults to the number of cores, workers=1 runs everything in the current process."""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+
+    if workers == 1:
+        reports = instrument.track(map(read_bet, paths), 'read_bet_folder', len(paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = instrument.track(pool.map(read_bet, paths), 'read_bet_folder', len(paths))
+
+    return {report['filename']: report for report in reports}
+
+
+def _decode_rows(rows, column_count):
+    # decode all rows of a section in one go and return its columns
+    values = np.array(' '.join(rows).split(), dtype=np.float64).reshape(-1, column_count)
+    return list(values.T)
+
+
+def _desorption_start(pressure):
+    # The isotherm switches to desorption after the first point with a lower pressure than its predecessor,
+    # that point itself still belongs to the adsorption branch
+    decreasing = np.flatnonzero(pressure < np.r_[0, pressure[:-1]])
+    return decreasing[0] + 1 if len(decreasing) else len(pressure)
@@ -1,7 +1,13 @@
+from concurrent.futures import ProcessPoolExecutor
+import datetime
 import numpy as np
 import pandas
 import pylabhelper.math as lm
+import pylabhelper.mpt as mpt
+from pylabhelper import cache as parse_cache
+from pylabhelper import instrument
 import re
+import time
 from textwrap import wrap
 import warnings
 from pylabhelper.BiologicFile import BiologicFile
@@ -13,9 +19,185 @@ except ImportError:
     print('Package \'originpro\' not found, no origin functionality')
 
 
-def load_mpt(path):
-    return BiologicFile(path)
+def load_mpt(path, columns=None, float32=False, cache=True, compact=False):
+    # compact (implied by float32) trades the float64 columns of the file for smaller dtypes, see mpt.compact
+    return BiologicFile(path, usecols=columns, compact=compact, float32=float32, cache=cache)
 
+
+def load_mpt_live(path, columns=None, float32=False, compact=False):
+    # file of a running measurement, call poll() on it to read the appended rows
+    return BiologicFile.live(path, usecols=columns, compact=compact, float32=float32)
+
+
+def load_mpt_many(paths, workers=None, pipeline=None, cache=True):
+    """Load and preprocess several mpt files in a process pool.
+
+    paths is either a dict of name -> path (like the file_list of the batch scripts) or a list of paths,
+    the returned dict of BiologicFile objects is keyed by the names or paths respectively.
+
+    pipeline is a list of BiologicFile methods applied to each file inside the worker, given as method name
+    or as (method name, kwargs) tuple, e.g.
+        [('crop_columns_to', {'list_of_columns': [...]}), ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+         'shift_cycles', 'extract_cycles', 'calculate_charge_discharge_capacitances']
+    To run different pipelines per file pass a dict of name -> pipeline instead. A leading crop_columns_to step
+    is applied while parsing, so the other columns are never materialized.
+
+    workers defaults to the number of cores, workers=1 runs everything in the current process.
+    A process pool re-imports the main module in every worker on Windows, so a script using it has to call
+    load_mpt_many below an if __name__ == '__main__': guard. Scripts run inside Origin have no such guard, they
+    have to pass workers=1 or leave the process pool to pylabhelper.engine.
+    cache=False bypasses the binary parse cache."""
+    if isinstance(paths, dict):
+        names = list(paths.keys())
+        path_list = list(paths.values())
+    else:
+        names = list(paths)
+        path_list = list(paths)
+
+    if isinstance(pipeline, dict):
+        pipelines = [pipeline.get(name, []) for name in names]
+    else:
+        pipelines = [pipeline or []] * len(names)
+
+    # a progress event is emitted for every loaded file, see pylabhelper/instrument.py
+    if workers == 1:
+        files = instrument.track(map(_load_mpt_with_pipeline, path_list, pipelines, [cache] * len(names)),
+                                 'load_mpt_many', len(names))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            files = instrument.track(pool.map(_load_mpt_with_pipeline, path_list, pipelines, [cache] * len(names)),
+                                     'load_mpt_many', len(names))
+
+    return dict(zip(names, files))
+
+
+def _load_mpt_with_pipeline(path, pipeline, cache):
+    usecols = None
+    if pipeline and not isinstance(pipeline[0], str) and pipeline[0][0] == 'crop_columns_to':
+        usecols = pipeline[0][1]['list_of_columns']
+        pipeline = pipeline[1:]
+
+    mpt_file = BiologicFile(path, usecols=usecols, cache=cache)
+
+    for step in pipeline:
+        method, kwargs = (step, {}) if isinstance(step, str) else step
+        getattr(mpt_file, method)(**kwargs)
+
+    return mpt_file
+
+
+def iter_mpt(path, chunksize=100000, by=None, columns=None):
+    """Read a biologic mpt file as BiologicFile chunks of at most chunksize rows (or one cycle each, see by)."""
+    return BiologicFile.iter_chunks(path, chunksize=chunksize, by=by, usecols=columns)
+
+
+def read_mpt(path, columns: object = {
+                     'time/s': 'time',
+                     'Ewe/V': 'potential',
+                     '<I>/mA': 'current',
+                     'half_cycle number': 'half_cycle'
+                 }, cache=True):
+    """Read a biologic mpt file into a pandas dataframe, extracting the cycles as they are described in the data."""
+    variant = f"read_mpt {columns!r}"
+    cached = parse_cache.load(path, variant) if cache else None
+    if cached is not None:
+        measurement, data = cached
+        return dict(measurement, path=path, data=data)
+
+    with open(path, 'rb') as file:
+        file_contents = mpt.read_header_lines(file)
+        measurement = _cv_header(path, file_contents)
+
+        # read only the desired columns of the ec data, the remaining columns are skipped by the tokenizer
+        cv_df = mpt.read_data(file, mpt.column_names(file_contents), usecols=list(columns.keys()))
+
+    cv_df = cv_df[list(columns.keys())]
+    cv_df = cv_df.rename(columns=columns)
+
+    # todo: put desired type in columns object as parameter...
+    cv_df['half_cycle'] = cv_df['half_cycle'].astype(int)
+
+    measurement['open_circuit_potential'] = cv_df['potential'][0]
+
+    if cache:
+        parse_cache.store(path, variant, measurement, cv_df)
+
+    return dict(measurement, data=cv_df)
+
+
+def read_mpt_header(path):
+    """Read only the header block of a cyclic voltammetry mpt file: speed, vertices and acquisition timestamp."""
+    with open(path, 'rb') as file:
+        return _cv_header(path, mpt.read_header_lines(file))
+
+
+def _cv_header(path, file_contents):
+    header_lines = len(file_contents)
+
+    # check if CV file
+    if not "Cyclic Voltammetry" in file_contents[3]:
+        raise Exception('File ist not a cyclic voltammetry file')
+
+    # slice header off file
+    header = file_contents[:(header_lines-1)]
+
+    # extract measurement speed
+    matching = [s for s in header if "dE/dt" in s]
+    speed = lm.to_float(matching[0][5:-3])
+
+    # extract acquisition timestamp
+    keyword = 'Acquisition started on'
+    time_format = "%m/%d/%Y %H:%M:%S.%f"
+    matching = [s for s in header if keyword in s]
+    #  - extract the data after the keyword (assuming \n as delimiter in the end
+    time_str = matching[0][len(keyword + ' : '):-1]
+    timestamp = time.mktime(datetime.datetime.strptime(time_str, time_format).timetuple())
+
+    # extract vertice potentials
+    matching = [s for s in header if "Ei (V)" in s]
+    start_vertice = lm.to_float(re.findall('([\-0-9]+[,\.][0-9]+)', matching[0])[0])
+
+    matching = [s for s in header if "E1 (V)" in s]
+    first_vertice = lm.to_float(re.findall('([\-0-9]+[,\.][0-9]+)', matching[0])[0])
+
+    matching = [s for s in header if "E2 (V)" in s]
+    second_vertice = lm.to_float(re.findall('([\-0-9]+[,\.][0-9]+)', matching[0])[0])
+
+    matching = [s for s in header if "Ef (V)" in s]
+    final_vertice = lm.to_float(re.findall('([\-0-9]+[,\.][0-9]+)', matching[0])[0])
+
+    return {
+        'speed': speed,
+        'start_vertice': start_vertice,
+        'first_vertice': first_vertice,
+        'second_vertice': second_vertice,
+        'final_vertice': final_vertice,
+        'path': path,
+        'timestamp': timestamp
+    }
+
+
+def _columns_to_sheet(sheet, data, columns):
+    """Write columns to an Origin worksheet in one bulk transfer and label them in one metadata pass.
+
+    columns is a list of (source, long name, units, comments, designation), source is the name of a column of data
+    or an array with a value for every row (e.g. np.full(len(data), value) for a constant, which may be a string
+    itself). The designations are the letters of sheet.cols_axis (X, Y, N, ...)."""
+    block = pandas.DataFrame({
+        index: data[source].to_numpy() if isinstance(source, str) else np.asarray(source)
+        for index, (source, *_) in enumerate(columns)
+    }, copy=False)
+
+    sheet.from_df(block)
+
+    long_names, units, comments, designations = (list(labels) for labels in zip(*(column[1:] for column in columns)))
+    sheet.set_labels(long_names, 'L')
+    sheet.set_labels(units, 'U')
+    sheet.set_labels(comments, 'C')
+    sheet.cols_axis(''.join(designations).lower())
+
+
+@instrument.stage(rows_out=None)
 def op_mpt_file_to_workbook(mpt, work_book_name):
     if op:
         work_book = op.new_book()
@@ -29,6 +211,7 @@ def op_mpt_file_to_workbook(mpt, work_book_name):
 
         work_book[0].destroy()
 
+@instrument.stage(rows_in=None, rows_out=None)
 def op_list_of_files_to_workbook(list_of_mpt, work_book_name, comment):
     if op:
         list_of_data = map(lambda mpt: mpt.data_cropped, list_of_mpt)
@@ -40,10 +223,12 @@ def op_list_of_files_to_workbook(list_of_mpt, work_book_name, comment):
 
         sheet = work_book.add_sheet(f"{work_book_name} {comment}")
 
-        sheet.from_list(0, list(full_df['time/s']), 'Time', 's', '', 'X')
-        sheet.from_list(1, list(full_df['Ewe/V']), 'Potential Working', 'V', f"WE {comment}", 'Y')
-        sheet.from_list(2, list(full_df['Ece/V']), 'Potential Counter', 'V', f"CE {comment}", 'Y')
-        sheet.from_list(3, list(full_df['Ewe-Ece/V']), 'Potential Full Cell', 'V', f"Full Cell {comment} mA", 'Y')
+        _columns_to_sheet(sheet, full_df, [
+            ('time/s', 'Time', 's', '', 'X'),
+            ('Ewe/V', 'Potential Working', 'V', f"WE {comment}", 'Y'),
+            ('Ece/V', 'Potential Counter', 'V', f"CE {comment}", 'Y'),
+            ('Ewe-Ece/V', 'Potential Full Cell', 'V', f"Full Cell {comment} mA", 'Y'),
+        ])
 
         work_book[0].destroy()
 
@@ -63,7 +248,53 @@ def op_list_of_files_to_workbook(list_of_mpt, work_book_name, comment):
         plot = graph[0].add_plot(sheet, coly=2, colx=0, type='line')
 
 
-def op_mb_charge_discharge_data_to_workbook(mpt_file, work_book_name, comment):
+def select_cycles(cycle_numbers, every=None, ends=None, logarithmic=None):
+    """Decimate the cycles of a long measurement, e.g. for stacked plots of stability tests.
+
+    every keeps every Nth cycle, ends keeps the first and last K cycles and logarithmic keeps about that many
+    cycles logarithmically spaced (dense at the start, sparse at the end). Several policies are combined,
+    without any policy all cycles are kept. Returns the kept cycle numbers in their original order."""
+    cycle_numbers = list(cycle_numbers)
+    if every is None and ends is None and logarithmic is None:
+        return cycle_numbers
+
+    keep = np.zeros(len(cycle_numbers), dtype=bool)
+    if every is not None:
+        keep[::every] = True
+    if ends is not None:
+        keep[:ends] = True
+        keep[max(len(keep) - ends, 0):] = True
+    if logarithmic is not None and len(keep) > 0:
+        positions = np.unique(np.round(np.geomspace(1, len(keep), logarithmic)).astype(int)) - 1
+        keep[positions] = True
+
+    return [cycle_number for cycle_number, kept in zip(cycle_numbers, keep) if kept]
+
+
+def _wide_cycles(cycles, cycle_numbers, columns):
+    # every cycle gets its own block of columns, shorter cycles are padded with NaN
+    length = max((len(cycle) for cycle in cycles), default=0)
+    block = np.full((length, len(cycles) * len(columns)), np.nan)
+    for position, cycle in enumerate(cycles):
+        block[:len(cycle), position * len(columns):(position + 1) * len(columns)] = cycle[columns].to_numpy()
+
+    return pandas.DataFrame(block, columns=[f"{column} {cycle_number}"
+                                            for cycle_number in cycle_numbers for column in columns])
+
+
+@instrument.stage(rows_in='_cycle_data', rows_out=None)
+def op_mb_charge_discharge_data_to_workbook(mpt_file, work_book_name, comment, layout='sheets', decimation=None):
+    """Export a Modulo Bat measurement with its cycles and capacitances to an Origin workbook.
+
+    layout selects how the cycles are written:
+        'sheets' one sheet per cycle (slow for more than a few hundred cycles)
+        'wide'   one sheet with a block of Time / Potential columns per cycle
+        'long'   one sheet with all cycles below each other and a Cycle column
+    decimation is a dict of select_cycles arguments, e.g. {'ends': 5, 'logarithmic': 20}, and limits the
+    exported cycles (and the stacked graph) to the selected ones. 'All Cycles' always holds the full data."""
+    if layout not in ['sheets', 'wide', 'long']:
+        raise Exception(f"Unknown layout '{layout}'")
+
     if op:
         work_book = op.new_book()
         work_book.name = work_book_name
@@ -72,33 +303,63 @@ def op_mb_charge_discharge_data_to_workbook(mpt_file, work_book_name, comment):
         sheet_all_cycles = work_book.add_sheet(f"All Cycles")
         cycle_sheets = []
 
-        sheet_all_cycles.from_list(0, list(mpt_file.data_cropped['time/s']), 'Time', 's', '', 'X')
-        sheet_all_cycles.from_list(1, list(mpt_file.data_cropped['Ewe/V']), 'Potential Working', 'V', f"WE {comment}", 'Y')
-        sheet_all_cycles.from_list(2, list(mpt_file.data_cropped['Ece/V']), 'Potential Counter', 'V', f"CE {comment}", 'Y')
-        sheet_all_cycles.from_list(3, list(mpt_file.data_cropped['Ewe-Ece/V']), 'Potential Full Cell', 'V', f"Full Cell {comment}", 'Y')
-
-        for cycle_number, cycle in zip(mpt_file.cycle_numbers, mpt_file.cycles):
-            cycle_sheet = work_book.add_sheet(f"Cycle {cycle_number}")
-
-            cycle_sheet.from_list(0, list(cycle['time/s']), 'Time', 's', '', 'X')
-            cycle_sheet.from_list(1, list(cycle['Ewe/V']),
-                                  'Potential Working', 'V', f"WE {comment} Cycle {cycle_number}", 'Y')
-            cycle_sheet.from_list(2, list(cycle['Ece/V']),
-                                  'Potential Counter', 'V', f"CE {comment} Cycle {cycle_number}", 'Y')
-            cycle_sheet.from_list(3, list(cycle['Ewe-Ece/V']),
-                                  'Potential Full Cell', 'V', f"Full Cell {comment} Cycle {cycle_number}", 'Y')
-            cycle_sheets.append(cycle_sheet)
+        _columns_to_sheet(sheet_all_cycles, mpt_file.data_cropped, [
+            ('time/s', 'Time', 's', '', 'X'),
+            ('Ewe/V', 'Potential Working', 'V', f"WE {comment}", 'Y'),
+            ('Ece/V', 'Potential Counter', 'V', f"CE {comment}", 'Y'),
+            ('Ewe-Ece/V', 'Potential Full Cell', 'V', f"Full Cell {comment}", 'Y'),
+        ])
+
+        cycles = dict(zip(mpt_file.cycle_numbers, mpt_file.cycles))
+        cycle_numbers = select_cycles(mpt_file.cycle_numbers, **(decimation or {}))
+        signals = [('Ewe/V', 'Potential Working', 'WE'), ('Ece/V', 'Potential Counter', 'CE'),
+                   ('Ewe-Ece/V', 'Potential Full Cell', 'Full Cell')]
+
+        if layout == 'sheets':
+            for cycle_number in cycle_numbers:
+                cycle_sheet = work_book.add_sheet(f"Cycle {cycle_number}")
+
+                _columns_to_sheet(cycle_sheet, cycles[cycle_number], [('time/s', 'Time', 's', '', 'X')] + [
+                    (column, long_name, 'V', f"{short_name} {comment} Cycle {cycle_number}", 'Y')
+                    for column, long_name, short_name in signals
+                ])
+                cycle_sheets.append(cycle_sheet)
+
+        elif layout == 'wide':
+            sheet_cycles = work_book.add_sheet(f"Cycles")
+            wide = _wide_cycles([cycles[cycle_number] for cycle_number in cycle_numbers], cycle_numbers,
+                                ['time/s'] + [column for column, _, _ in signals])
+
+            _columns_to_sheet(sheet_cycles, wide, [
+                specification
+                for cycle_number in cycle_numbers
+                for specification in [(f"time/s {cycle_number}", 'Time', 's', f"Cycle {cycle_number}", 'X')] + [
+                    (f"{column} {cycle_number}", long_name, 'V', f"{short_name} {comment} Cycle {cycle_number}", 'Y')
+                    for column, long_name, short_name in signals
+                ]
+            ])
+
+        else:
+            sheet_cycles = work_book.add_sheet(f"Cycles")
+            long = pandas.concat([cycles[cycle_number] for cycle_number in cycle_numbers], ignore_index=True)
+            long['Cycle'] = np.repeat(cycle_numbers, [len(cycles[cycle_number]) for cycle_number in cycle_numbers])
+
+            _columns_to_sheet(sheet_cycles, long, [('Cycle', 'Cycle', '', '', 'N'), ('time/s', 'Time', 's', '', 'X')] + [
+                (column, long_name, 'V', f"{short_name} {comment}", 'Y') for column, long_name, short_name in signals
+            ])
 
         sheet_capacitances = work_book.add_sheet(f"Capacitances")
 
-        sheet_capacitances.from_list(0, list(mpt_file.capacitances['Cycle Number']), 'Cycle', '', '', 'X')
-        sheet_capacitances.from_list(1, list(mpt_file.capacitances['Current']), 'Current', 'mA', '', 'N')
-        sheet_capacitances.from_list(2, list(mpt_file.capacitances['Ideal Charge Capacitance']), 'Ideal Charge Capacitance', 'mF', '', 'Y')
-        sheet_capacitances.from_list(3, list(mpt_file.capacitances['Ideal Discharge Capacitance']), 'Ideal Discharge Capacitance', 'mF', '', 'Y')
-        sheet_capacitances.from_list(4, list(mpt_file.capacitances['Charge Ideality']), 'Charge Ideality', '', '', 'Y')
-        sheet_capacitances.from_list(5, list(mpt_file.capacitances['Discharge Ideality']), 'Discharge Ideality', '', '', 'Y')
-        sheet_capacitances.from_list(6, list(mpt_file.capacitances['Faradayic Efficiency']), 'Faradayic Efficiency', '', '', 'Y')
-        sheet_capacitances.from_list(7, list(mpt_file.capacitances['Discharge Polarity Gap']), 'Discharge Polarity Gap', 'V', '', 'Y')
+        _columns_to_sheet(sheet_capacitances, mpt_file.capacitances, [
+            ('Cycle Number', 'Cycle', '', '', 'X'),
+            ('Current', 'Current', 'mA', '', 'N'),
+            ('Ideal Charge Capacitance', 'Ideal Charge Capacitance', 'mF', '', 'Y'),
+            ('Ideal Discharge Capacitance', 'Ideal Discharge Capacitance', 'mF', '', 'Y'),
+            ('Charge Ideality', 'Charge Ideality', '', '', 'Y'),
+            ('Discharge Ideality', 'Discharge Ideality', '', '', 'Y'),
+            ('Faradayic Efficiency', 'Faradayic Efficiency', '', '', 'Y'),
+            ('Discharge Polarity Gap', 'Discharge Polarity Gap', 'V', '', 'Y'),
+        ])
 
         work_book[0].destroy()
 
@@ -125,13 +386,27 @@ def op_mb_charge_discharge_data_to_workbook(mpt_file, work_book_name, comment):
         graph.lname = f"{work_book_name} Stacked"
         graph.name = f"{work_book_name} Stacked"
 
-        for cycle_sheet in cycle_sheets:
-            plot = graph[0].add_plot(cycle_sheet, coly=3, colx=0, type='line')
+        if layout == 'sheets':
+            for cycle_sheet in cycle_sheets:
+                plot = graph[0].add_plot(cycle_sheet, coly=3, colx=0, type='line')
+        elif layout == 'wide':
+            # all cycles are column ranges of the same sheet
+            for position in range(len(cycle_numbers)):
+                plot = graph[0].add_plot(sheet_cycles, coly=4 * position + 3, colx=4 * position, type='line')
+        else:
+            # one plot per cycle over its rows, a single trace would connect the end of a cycle with the start of
+            # the next one (Origin rows are counted from 1, -b and -e set the first and last row of a data plot)
+            lengths = [len(cycles[cycle_number]) for cycle_number in cycle_numbers]
+            for first_row, length in zip(np.r_[0, np.cumsum(lengths)[:-1]], lengths):
+                plot = graph[0].add_plot(sheet_cycles, coly=4, colx=1, type='line')
+                plot.set_cmd(f"-b {first_row + 1}")
+                plot.set_cmd(f"-e {first_row + length}")
         graph[0].group()
         graph[0].rescale()
 
 
 
+@instrument.stage(rows_in=None, rows_out=None)
 def op_capacitances_workbook(list_of_mpt, work_book_name, comment, layer):
     if op:
         list_of_data = map(lambda mpt: mpt.capacitances, list_of_mpt)
@@ -143,15 +418,17 @@ def op_capacitances_workbook(list_of_mpt, work_book_name, comment, layer):
 
         sheet = work_book.add_sheet(f"{work_book_name} {comment}")
 
-        sheet.from_list(0, list(full_cap_df['Cycle Number']),                   'Cycle', '', '', 'N')
-        sheet.from_list(1, [layer] * len(list(full_cap_df['Cycle Number'])),    'Current', 'mA', '', 'N')
-        sheet.from_list(2, list(full_cap_df['Current']),                        'Current', 'mA', '', 'X')
-        sheet.from_list(3, list(full_cap_df['Ideal Charge Capacitance']),       'Ideal Charge Capacitance', 'mF', comment, 'Y')
-        sheet.from_list(4, list(full_cap_df['Ideal Discharge Capacitance']),    'Ideal Discharge Capacitance', 'mF', comment, 'Y')
-        sheet.from_list(5, list(full_cap_df['Charge Ideality']),                'Charge Ideality', '', comment, 'Y')
-        sheet.from_list(6, list(full_cap_df['Discharge Ideality']),             'Discharge Ideality', '', comment, 'Y')
-        sheet.from_list(7, list(full_cap_df['Faradayic Efficiency']),           'Faradayic Efficiency', 'mF/mF', comment, 'Y')
-        sheet.from_list(8, list(full_cap_df['Discharge Polarity Gap']),         'Discharge Polarity Gap', 'V', comment, 'Y')
+        _columns_to_sheet(sheet, full_cap_df, [
+            ('Cycle Number', 'Cycle', '', '', 'N'),
+            (np.full(len(full_cap_df), layer), 'Current', 'mA', '', 'N'),
+            ('Current', 'Current', 'mA', '', 'X'),
+            ('Ideal Charge Capacitance', 'Ideal Charge Capacitance', 'mF', comment, 'Y'),
+            ('Ideal Discharge Capacitance', 'Ideal Discharge Capacitance', 'mF', comment, 'Y'),
+            ('Charge Ideality', 'Charge Ideality', '', comment, 'Y'),
+            ('Discharge Ideality', 'Discharge Ideality', '', comment, 'Y'),
+            ('Faradayic Efficiency', 'Faradayic Efficiency', 'mF/mF', comment, 'Y'),
+            ('Discharge Polarity Gap', 'Discharge Polarity Gap', 'V', comment, 'Y'),
+        ])
 
         work_book[0].destroy()
 
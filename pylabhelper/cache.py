@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas
+
+# Bump whenever the parsers change their output, all existing entries become stale
+PARSER_VERSION = 1
+
+# Location and size bound of the cache, both can be set from the environment
+CACHE_DIR = os.environ.get('PYLABHELPER_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'pylabhelper'))
+MAX_SIZE = int(os.environ.get('PYLABHELPER_CACHE_SIZE', 2 * 2**30))  # in bytes
+
+# Global opt-out, PYLABHELPER_NO_CACHE=1 disables the cache for every loader
+enabled = os.environ.get('PYLABHELPER_NO_CACHE', '') == ''
+
+
+def _entry(path, variant):
+    # an entry is only valid for this exact file state and parser version
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{PARSER_VERSION}|{variant}"
+    return os.path.join(CACHE_DIR, hashlib.sha1(key.encode()).hexdigest())
+
+
+def load(path, variant=''):
+    """Return the cached (meta, data) of a parsed file or None.
+
+    The columns of data are memory mapped copy-on-write, so modifying them never touches the cache."""
+    if not enabled:
+        return None
+
+    entry = _entry(path, variant)
+    try:
+        with open(os.path.join(entry, 'meta.pkl'), 'rb') as file:
+            meta, columns = pickle.load(file)
+
+        data = pandas.DataFrame({
+            column: np.load(os.path.join(entry, f"{index}.npy"), mmap_mode='c')
+            for index, column in enumerate(columns)
+        }, copy=False)
+
+        # mark as recently used for the LRU eviction
+        os.utime(entry)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+
+    return meta, data
+
+
+def store(path, variant, meta, data):
+    """Store meta (any picklable object) and the columns of data as binary sidecar for path."""
+    if not enabled:
+        return
+
+    entry = _entry(path, variant)
+    partial = f"{entry}.{os.getpid()}.partial"
+
+    try:
+        os.makedirs(partial, exist_ok=True)
+        for index, column in enumerate(data.columns):
+            np.save(os.path.join(partial, f"{index}.npy"), np.ascontiguousarray(data[column].to_numpy()))
+
+        with open(os.path.join(partial, 'meta.pkl'), 'wb') as file:
+            pickle.dump((meta, list(data.columns)), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(partial, entry)
+    except OSError:
+        # e.g. another process stored the same entry first, or the cache dir is not writable
+        shutil.rmtree(partial, ignore_errors=True)
+        return
+
+    # cleaning up is best effort, it must never fail the load that stored the entry
+    try:
+        evict()
+    except OSError:
+        pass
+
+
+def evict(max_size=None):
+    """Remove least recently used entries until the cache is smaller than max_size bytes."""
+    max_size = MAX_SIZE if max_size is None else max_size
+
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        try:
+            if not entry.is_dir() or entry.name.endswith('.partial'):
+                continue
+            size = sum(file.stat().st_size for file in os.scandir(entry.path))
+            entries.append((entry.stat().st_mtime, size, entry.path))
+        except OSError:
+            # removed by another process evicting at the same time
+            continue
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total <= max_size:
+            break
+        # entries still memory mapped (on windows) can not be removed, they are retried next time
+        shutil.rmtree(entry_path, ignore_errors=True)
+        total -= size
+
+
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas
+
+
+class CycleIndex:
+    """Row ranges of the cycles in a DataFrame.
+
+    Holds the sorted boundaries (starts, stops) and a dict of cycle number -> (start, stop), so every cycle
+    is returned as a contiguous iloc view instead of a boolean scan over the whole label column."""
+
+    def __init__(self, labels, starts, stops):
+        self.labels = list(labels)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        self._ranges = {label: (int(start), int(stop)) for label, start, stop in zip(self.labels, starts, stops)}
+
+    @classmethod
+    def from_labels(cls, labels):
+        """Index of a label column in which every cycle is one contiguous block (e.g. cycle_number)."""
+        labels = np.asarray(labels)
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])[:len(labels)]
+        stops = np.r_[starts[1:], len(labels)][:len(starts)]
+
+        if len(pandas.unique(labels[starts])) != len(starts):
+            raise Exception('Cycle labels are not contiguous')
+
+        return cls(labels[starts], starts, stops)
+
+    @classmethod
+    def from_boundaries(cls, boundaries, length, first_label=0):
+        """Index of consecutive cycles split at the given row positions, numbered from first_label."""
+        starts = np.r_[0, boundaries]
+        stops = np.r_[boundaries, length]
+        return cls(range(first_label, first_label + len(starts)), starts, stops)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self._ranges
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def range(self, label):
+        # unknown cycles are empty
+        return self._ranges.get(label, (0, 0))
+
+    def slice(self, frame, label):
+        start, stop = self.range(label)
+        return frame.iloc[start:stop]
+
+    def slices(self, frame):
+        for start, stop in zip(self.starts, self.stops):
+            yield frame.iloc[start:stop]
+
+    def compress(self, keep):
+        """Index of the same cycles after the rows of the indexed frame were filtered by the boolean mask keep."""
+        kept_before = np.r_[0, np.cumsum(keep)]
+        return CycleIndex(self.labels, kept_before[self.starts], kept_before[self.stops])
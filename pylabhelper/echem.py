@@ -3,9 +3,8 @@ import math
 from pylabhelper.CV import CV
 from typing import List
 import numpy as np
-from sklearn.linear_model import LinearRegression
 import pandas as pd
-from scipy.optimize import curve_fit
+import pylabhelper.math as lm
 
 
 def read_cv_file(path):
@@ -22,70 +21,51 @@ def fc_analysis(files: List[CV], cycle_number, cutoff=-1):
     # Sort cycles list by speed
     files.sort(key=lambda item: item.speed)
 
-    lin_reg_list = []
-    f_reg_list = []
-
     speeds = []
     cycles = []
     for file in files:
         speeds.append(file.speed)
         cycles.append(file.interp_data[file.interp_data['half_cycle'] == cycle_number])
 
-    x = np.sqrt(speeds).reshape((-1, 1))
     speeds_squared = np.sqrt(speeds)
 
-    fc_data = {
-        'index': [],
-        'potential': [],
-        'faradayic': [],
-        'capacitive': [],
-        'direction': [],
-        'rSq': []
-    }
-
-    for index, row in cycles[0].iterrows():
-        y = []
-        for speed_index in range(len(speeds)):
-            y.append(cycles[speed_index].current[index])
-
-        popt, pcov = curve_fit(fitting_function, np.array(speeds)[:cutoff], y[:cutoff])
-
-        capacitive_error = np.sqrt(np.diag(pcov))[0]
-        faradayic_error = np.sqrt(np.diag(pcov))[1]
-        capacitive = popt[0]
-        faradayic = popt[1]
-
-        f_reg_list.append([row.potential] + y + [capacitive_error, faradayic_error, faradayic, capacitive, row.direction])
-
-    for index, row in cycles[0].iterrows():
-        y = []
-        for speed_index in range(len(speeds)):
-            y.append(cycles[speed_index].current[index] / np.sqrt(speeds[speed_index]))
-
-        model = LinearRegression().fit(x[:cutoff], y[:cutoff])
-        rSq = model.score(x[:cutoff], y[:cutoff])
-        faradayic = model.intercept_
-        capacitive = model.coef_[0]
-
-        fc_data['index'].append(index)
-        fc_data['potential'].append(row['potential'])
-        fc_data['faradayic'].append(faradayic)
-        fc_data['capacitive'].append(capacitive)
-        fc_data['direction'].append(row['direction'])
-        fc_data['rSq'].append(rSq)
-
-        lin_reg_list.append([cycles[speed_index].potential[index]] + y + [rSq, faradayic, capacitive, row['direction']])
-
-    return \
-        pd.DataFrame(fc_data),\
-        pd.DataFrame(
-            lin_reg_list,
-            columns=['potential'] + list(speeds_squared) + ['rSq', 'faradayic', 'capacitive', 'direction']
-        ),\
-        pd.DataFrame(
-            f_reg_list,
-            columns=['potential'] + list(speeds) + ['capacitive_error', 'faradayic_error', 'faradayic', 'capacitive', 'direction']
-        )
+    # Fit the faradayic and capacitive coefficients of all potentials at once, the model is linear in both
+    currents = np.array([cycle.current.to_numpy() for cycle in cycles])
+    fit_speeds = np.array(speeds)[:cutoff]
+    design = np.column_stack([fit_speeds + np.power(fit_speeds, 2),
+                              np.power(fit_speeds, 1/2) + np.power(fit_speeds, 3/2)])
+    coefficients, errors, _, _ = lm.least_squares(design, currents[:cutoff])
+
+    f_reg_df = pd.DataFrame(currents.T, columns=list(speeds))
+    f_reg_df.insert(0, 'potential', cycles[0].potential.to_numpy())
+    f_reg_df['capacitive_error'] = errors[0]
+    f_reg_df['faradayic_error'] = errors[1]
+    f_reg_df['faradayic'] = coefficients[1]
+    f_reg_df['capacitive'] = coefficients[0]
+    f_reg_df['direction'] = cycles[0].direction.to_numpy()
+
+    # Linear regression of I / sqrt(v) over sqrt(v) for all potentials at once
+    x = speeds_squared
+    y = currents / x.reshape((-1, 1))
+    faradayic, capacitive, rSq = lm.linear_regression(x[:cutoff], y[:cutoff])
+
+    fc_data = pd.DataFrame({
+        'index': cycles[0].index.to_numpy(),
+        'potential': cycles[0].potential.to_numpy(),
+        'faradayic': faradayic,
+        'capacitive': capacitive,
+        'direction': cycles[0].direction.to_numpy(),
+        'rSq': rSq,
+    })
+
+    lin_reg_df = pd.DataFrame(y.T, columns=list(speeds_squared))
+    lin_reg_df.insert(0, 'potential', cycles[-1].potential.to_numpy())
+    lin_reg_df['rSq'] = rSq
+    lin_reg_df['faradayic'] = faradayic
+    lin_reg_df['capacitive'] = capacitive
+    lin_reg_df['direction'] = cycles[0].direction.to_numpy()
+
+    return fc_data, lin_reg_df, f_reg_df
 
 
 class FCAnalysis:
@@ -138,47 +118,28 @@ class FCAnalysis:
 
             return current
 
+        # The model is linear in its coefficients, so all potentials are solved in one batched least squares call
+        speeds = np.array(self._speeds)
+        design = np.column_stack([np.power(speeds, 1 + power) for power in range(coefficient_order)] +
+                                 [np.power(speeds, 1/2 + power) for power in range(coefficient_order)])
+
+        # speeds x potentials
+        currents = np.array([cycle.current.to_numpy() for cycle in self._cycles])
+
+        coefficients, errors, fitted_currents, rSq = lm.least_squares(design, currents)
+
         self._regression_data = {
-            'index': [],
-            'potential': [],
-            'currents': [],
-            'fitted_currents': [],
-            'faradayic_coefficients': [],
-            'capacitive_coefficients': [],
-            'faradayic_errors': [],
-            'capacitive_errors': [],
-            'rSq': [],
+            'index': self._cycles[0].index.to_numpy(),
+            'potential': self._cycles[0].potential.to_numpy(),
+            'currents': list(currents.T),
+            'fitted_currents': list(fitted_currents.T),
+            'faradayic_coefficients': list(coefficients[coefficient_order:].T),
+            'capacitive_coefficients': list(coefficients[:coefficient_order].T),
+            'faradayic_errors': list(errors[coefficient_order:].T),
+            'capacitive_errors': list(errors[:coefficient_order].T),
+            'rSq': rSq,
         }
 
-        for index, row in self._cycles[0].iterrows():
-            currents = []
-            for speed_index in range(len(self._speeds)):
-                currents.append(self._cycles[speed_index].current[index])
-
-            popt, pcov = curve_fit(self._regression_function, np.array(self._speeds), currents, p0=np.ones(coefficient_order*2))
-
-            pcov_diag = np.sqrt(np.diag(pcov))
-            capacitive_error = pcov_diag[0:coefficient_order]
-            faradayic_error = pcov_diag[coefficient_order:coefficient_order*2]
-
-            capacitive = popt[0:coefficient_order]
-            faradayic = popt[coefficient_order:coefficient_order*2]
-
-            residuals = currents - self._regression_function(np.array(self._speeds), *popt)
-            ss_res = np.sum(residuals**2)
-            ss_tot = np.sum((currents - np.mean(currents))**2)
-            rSq = 1 - (ss_res / ss_tot)
-
-            self._regression_data['index'].append(index)
-            self._regression_data['potential'].append(row.potential)
-            self._regression_data['currents'].append(currents)
-            self._regression_data['fitted_currents'].append(self._regression_function(np.array(self._speeds), *popt))
-            self._regression_data['faradayic_coefficients'].append(faradayic)
-            self._regression_data['capacitive_coefficients'].append(capacitive)
-            self._regression_data['faradayic_errors'].append(faradayic_error)
-            self._regression_data['capacitive_errors'].append(capacitive_error)
-            self._regression_data['rSq'].append(rSq)
-
         self._regression_data = pd.DataFrame(self._regression_data)
 
     def potential(self):
@@ -0,0 +1,216 @@
+# Headless processing of mpt files, outside of Origin.
+#
+# The pipelines run in a process pool and every processed file is written to a result directory as one
+# binary .npy file per column plus its metadata. Inside Origin load_results() only maps these tables back
+# into BiologicFile objects for the op_* exporters of pylabhelper.biologic, e.g.
+#
+#     python -m pylabhelper.engine results/ --pipeline cd *_MB_C01.mpt --pipeline ocv *_OCV_C01.mpt
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import numpy as np
+import os
+import pandas
+import pickle
+import shutil
+from pylabhelper import biologic, instrument
+from pylabhelper.BiologicFile import BiologicFile
+from pylabhelper.cycles import CycleIndex
+
+# Bump whenever the layout of a result directory changes
+FORMAT_VERSION = 2
+
+PIPELINES = {
+    'cd': [
+        ('crop_columns_to', {'list_of_columns': ['time/s', 'cycle_number', 'half_cycle', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V', 'I/mA']}),
+        ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+        'shift_time_to_zero',
+        'shift_cycles',
+        'extract_cycles',
+        'calculate_charge_discharge_capacitances',
+    ],
+    'ocv': [
+        ('crop_columns_to', {'list_of_columns': ['time/s', 'Ewe/V', 'Ece/V', 'Ewe-Ece/V']}),
+        ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+    ],
+}
+
+# tables of a BiologicFile that are written, the cycle and half cycle lists are views on *_data
+TABLES = ['data', 'data_cropped', '_cycle_data', '_half_cycle_data', 'capacitances']
+
+
+def run(paths, output, pipeline=None, workers=None, cache=True):
+    """Process the mpt files and write the results to the directory output.
+
+    paths and pipeline are given as for biologic.load_mpt_many (pipeline steps may also be a name of PIPELINES).
+    The files are processed and written in the worker processes, only a summary per file is sent back.
+    Returns the names in order, which are also stored in output/index.json."""
+    if isinstance(paths, dict):
+        names = list(paths.keys())
+        path_list = list(paths.values())
+    else:
+        names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+        path_list = list(paths)
+
+    if isinstance(pipeline, dict):
+        pipelines = [_steps(pipeline.get(name)) for name in names]
+    else:
+        pipelines = [_steps(pipeline)] * len(names)
+
+    os.makedirs(output, exist_ok=True)
+    directories = [os.path.join(output, name) for name in names]
+
+    if workers == 1:
+        summaries = instrument.track(map(_process, path_list, pipelines, directories, [cache] * len(names)),
+                                     'engine.run', len(names))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = instrument.track(pool.map(_process, path_list, pipelines, directories, [cache] * len(names)),
+                                         'engine.run', len(names))
+
+    with open(os.path.join(output, 'index.json'), 'w') as file:
+        json.dump({'format': FORMAT_VERSION, 'measurements': dict(zip(names, summaries))}, file, indent=2)
+
+    return names
+
+
+def save(mpt_file, directory):
+    """Write the tables and metadata of a processed BiologicFile to directory."""
+    partial = f"{directory}.{os.getpid()}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    tables = [table for table in TABLES if getattr(mpt_file, table) is not None]
+
+    columns = {}
+    for table in tables:
+        frame = getattr(mpt_file, table)
+        # every index but 0 .. n-1 carries information, e.g. the original row numbers of data_cropped
+        stored_index = not _default_index(frame.index)
+        columns[table] = (list(frame.columns), frame.index.name, stored_index)
+        for index, column in enumerate(frame.columns):
+            np.save(os.path.join(partial, f"{table}.{index}.npy"), np.ascontiguousarray(frame[column].to_numpy()))
+        if stored_index:
+            np.save(os.path.join(partial, f"{table}.index.npy"), frame.index.to_numpy())
+
+    segments = {table: (index.labels, index.starts, index.stops)
+                for table, index in [('_cycle_segments', mpt_file._cycle_segments),
+                                     ('_half_cycle_segments', mpt_file._half_cycle_segments)] if index is not None}
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'header': mpt_file.header,
+        'history': mpt_file.history,
+        'columns': columns,
+        'segments': segments,
+    }
+    with open(os.path.join(partial, 'meta.pkl'), 'wb') as file:
+        pickle.dump(meta, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(partial, directory)
+
+
+def load(directory):
+    """Map a result directory written by save() back into a BiologicFile."""
+    with open(os.path.join(directory, 'meta.pkl'), 'rb') as file:
+        meta = pickle.load(file)
+
+    if meta['format'] != FORMAT_VERSION:
+        raise Exception(f"Result format {meta['format']} is not supported, process the files again")
+
+    tables = {}
+    for table, (columns, index_name, stored_index) in meta['columns'].items():
+        tables[table] = pandas.DataFrame({
+            column: np.load(os.path.join(directory, f"{table}.{index}.npy"), mmap_mode='c')
+            for index, column in enumerate(columns)
+        }, copy=False)
+        if stored_index:
+            tables[table].index = pandas.Index(np.load(os.path.join(directory, f"{table}.index.npy")))
+        tables[table].index.name = index_name
+
+    mpt_file = BiologicFile.from_data(meta['header'], tables['data'], meta['history'])
+    mpt_file.data_cropped = tables.get('data_cropped')
+    mpt_file.capacitances = tables.get('capacitances')
+
+    if '_cycle_segments' in meta['segments']:
+        mpt_file._cycle_data = tables['_cycle_data']
+        mpt_file._cycle_segments = CycleIndex(*meta['segments']['_cycle_segments'])
+        mpt_file.cycle_numbers = mpt_file._cycle_segments.labels
+        mpt_file.cycles = list(mpt_file._cycle_segments.slices(mpt_file._cycle_data))
+
+    if '_half_cycle_segments' in meta['segments']:
+        mpt_file._half_cycle_data = tables['_half_cycle_data']
+        mpt_file._half_cycle_segments = CycleIndex(*meta['segments']['_half_cycle_segments'])
+        mpt_file.half_cycle_numbers = mpt_file._half_cycle_segments.labels
+        mpt_file.half_cycles = list(mpt_file._half_cycle_segments.slices(mpt_file._half_cycle_data))
+
+    return mpt_file
+
+
+def load_results(output):
+    """Load all results written by run() as dict of name -> BiologicFile, in the order they were processed."""
+    with open(os.path.join(output, 'index.json')) as file:
+        index = json.load(file)
+
+    return {name: load(os.path.join(output, name)) for name in index['measurements']}
+
+
+def _default_index(index):
+    return isinstance(index, pandas.RangeIndex) and index.start == 0 and index.step == 1
+
+
+def _steps(pipeline):
+    return PIPELINES[pipeline] if isinstance(pipeline, str) else pipeline or []
+
+
+def _process(path, pipeline, directory, cache):
+    mpt_file = biologic._load_mpt_with_pipeline(path, pipeline, cache)
+    save(mpt_file, directory)
+
+    return {
+        'path': os.path.abspath(path),
+        'file_type': mpt_file.header['file_type'],
+        'rows': len(mpt_file.data),
+        'cycles': len(mpt_file.cycle_numbers),
+        'history': sorted(step for step in mpt_file.history if step != 'stages'),
+        # only recorded with instrumentation enabled (see pylabhelper/instrument.py)
+        'stages': mpt_file.history.get('stages', []),
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m pylabhelper.engine',
+                                     description='Process mpt files outside of Origin.')
+    parser.add_argument('output', help='result directory')
+    parser.add_argument('--pipeline', nargs='+', action='append', metavar=('PIPELINE', 'FILE'), required=True,
+                        help=f"pipeline ({', '.join(PIPELINES)} or a json file with a list of steps) "
+                             f"followed by the files it is applied to, can be given several times")
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, defaults to the cores')
+    parser.add_argument('--no-cache', action='store_true', help='bypass the binary parse cache')
+    arguments = parser.parse_args(arguments)
+
+    if instrument.print_event not in instrument.listeners:
+        instrument.listeners.append(instrument.print_event)
+
+    paths = {}
+    pipeline = {}
+    for pipeline_name, *files in arguments.pipeline:
+        if pipeline_name not in PIPELINES:
+            with open(pipeline_name) as file:
+                # json has no tuples, [method, kwargs] steps are converted back
+                steps = [step if isinstance(step, str) else tuple(step) for step in json.load(file)]
+        else:
+            steps = pipeline_name
+        for path in files:
+            name = os.path.splitext(os.path.basename(path))[0]
+            paths[name] = path
+            pipeline[name] = steps
+
+    names = run(paths, arguments.output, pipeline, workers=arguments.workers, cache=not arguments.no_cache)
+    print(f"Processed {len(names)} files into {arguments.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# Opt-in instrumentation of the pipeline stages and structured progress events.
+#
+# With instrumentation enabled (enable() or PYLABHELPER_INSTRUMENT=1) every stage of a BiologicFile appends its
+# wall time, rows in / out and peak allocation to history['stages'], e.g.
+#
+#     {'stage': 'resolution_crop', 'seconds': 0.012, 'rows_in': 52011, 'rows_out': 3190, 'peak_bytes': 1261568}
+#
+# The records travel with the files out of the worker processes, report() and report_text() summarize them for
+# a whole batch. Stages of several files at once (e.g. the Origin exports of a list of files) are collected in
+# batch_stages of the current process.
+#
+# Progress events of the batch loaders are always emitted, every function in listeners is called with them. The
+# library itself prints nothing, command line entry points (pylabhelper.engine, the benchmarks) and scripts add
+# print_event to listeners.
+
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Global opt-in, the environment variable is inherited by the worker processes
+enabled = os.environ.get('PYLABHELPER_INSTRUMENT', '') != ''
+
+# Stage records that do not belong to a single file, in the order they were measured
+batch_stages = []
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+    # spawned worker processes only see the environment
+    if on:
+        os.environ['PYLABHELPER_INSTRUMENT'] = '1'
+    else:
+        os.environ.pop('PYLABHELPER_INSTRUMENT', None)
+
+
+@contextmanager
+def measure(name, **fields):
+    """Measure the wall time and peak allocation of the block, yields the record (None if not enabled)."""
+    if not enabled:
+        yield None
+        return
+
+    record = dict({'stage': name}, **fields)
+
+    # a nested measurement resets the peak of the enclosing one, stages are therefore never nested
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['peak_bytes'] = max(tracemalloc.get_traced_memory()[1] - base, 0)
+        if not tracing:
+            tracemalloc.stop()
+
+
+def stage(name=None, rows_in='data', rows_out='data'):
+    """Record a function as pipeline stage, rows_in and rows_out name the tables of the first argument to count.
+
+    The record is appended to the history of the first argument, or to batch_stages if it has none."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(target, *args, **kwargs):
+            with measure(name or function.__name__, rows_in=_rows(target, rows_in)) as record:
+                result = function(target, *args, **kwargs)
+
+            if record is not None:
+                record['rows_out'] = _rows(target, rows_out)
+                history = getattr(target, 'history', None)
+                (batch_stages if history is None else history.setdefault('stages', [])).append(record)
+
+            return result
+        return wrapper
+    return decorator
+
+
+def _rows(target, table):
+    frame = getattr(target, table, None) if table is not None else None
+    return None if frame is None else len(frame)
+
+
+# ################# Progress Events #################
+
+def print_event(event):
+    print(format_event(event))
+
+
+listeners = []
+
+
+def emit(kind, **fields):
+    event = dict({'event': kind, 'time': time.time()}, **fields)
+    for listener in listeners:
+        listener(event)
+    return event
+
+
+def format_event(event):
+    if event['event'] in ['progress', 'finished']:
+        state = f"{event['done']}/{event['total']}" if event['event'] == 'progress' else f"finished {event['done']}"
+        return f"{event['label']}: {state} {event['unit']} in {event['seconds']:.1f} s " \
+               f"({event['rate']:.2f} {event['unit']}/s)"
+    return json.dumps(event)
+
+
+def track(results, label, total, unit='files'):
+    """Collect the results of a (pool) map into a list, emitting a progress event per result and a finished event."""
+    start = time.perf_counter()
+    collected = []
+
+    def progress(kind):
+        seconds = time.perf_counter() - start
+        emit(kind, label=label, done=len(collected), total=total, unit=unit, seconds=seconds,
+             rate=len(collected) / seconds if seconds > 0 else 0.0)
+
+    for result in results:
+        collected.append(result)
+        progress('progress')
+    progress('finished')
+
+    return collected
+
+
+# ################# Batch Report #################
+
+def report(files):
+    """Stages of a batch as json serializable dict.
+
+    files is a dict of name -> BiologicFile (or a list) as returned by biologic.load_mpt_many, the stages of every
+    file and their totals per stage name are reported together with batch_stages."""
+    if not isinstance(files, dict):
+        files = {str(index): file for index, file in enumerate(files)}
+
+    per_file = {name: file.history.get('stages', []) for name, file in files.items()}
+
+    totals = {}
+    for record in [record for records in per_file.values() for record in records] + batch_stages:
+        total = totals.setdefault(record['stage'], {'count': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+                                                    'peak_bytes': 0})
+        total['count'] += 1
+        total['seconds'] += record['seconds']
+        total['rows_in'] += record['rows_in'] or 0
+        total['rows_out'] += record['rows_out'] or 0
+        total['peak_bytes'] = max(total['peak_bytes'], record['peak_bytes'])
+
+    return {'files': per_file, 'batch': list(batch_stages), 'totals': totals}
+
+
+def report_json(files, path=None):
+    """report() as json text, also written to path if given."""
+    text = json.dumps(report(files), indent=2)
+    if path is not None:
+        with open(path, 'w') as file:
+            file.write(text)
+    return text
+
+
+def report_text(files):
+    """report() as table, one line per stage of every file followed by the totals per stage."""
+    summary = report(files)
+    lines = []
+
+    def line(name, stage_name, record):
+        lines.append(f"{name:<30} {stage_name:<40} {record['seconds']:9.3f} s "
+                     f"{_count(record['rows_in']):>10} -> {_count(record['rows_out']):>10} rows "
+                     f"peak {record['peak_bytes'] / 2**20:8.1f} MiB")
+
+    for name, records in list(summary['files'].items()) + [('batch', summary['batch'])]:
+        for record in records:
+            line(name, record['stage'], record)
+
+    lines.append('')
+    for stage_name, total in sorted(summary['totals'].items(), key=lambda item: -item[1]['seconds']):
+        line(f"total ({total['count']}x)", stage_name, total)
+
+    return '\n'.join(lines)
+
+
+def _count(rows):
+    return '-' if rows is None else str(rows)
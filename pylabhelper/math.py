@@ -1,3 +1,4 @@
+import numpy as np
 from scipy import interpolate as interp
 
 
@@ -5,18 +6,191 @@ def to_float(s):
     return float(s.replace(',', '.'))
 
 
+INTERPOLATION_METHODS = ['interp1d', 'CubicSpline', 'Akima1DInterpolator']
+
+
 def interpolate(x_measured, y_measured, x_ideal, method = 'interp1d'):
-    if method == 'interp1d':
-        f = interp.interp1d(x_measured, y_measured,
-                bounds_error=False,
-                fill_value="extrapolate")
-        return f(x_ideal)
-    if method == 'CubicSpline':
-        f = interp.CubicSpline(x_measured, y_measured,
-                extrapolate=True)
-        return f(x_ideal)
-    if method == 'Akima1DInterpolator':
-        f = interp.Akima1DInterpolator(x_measured, y_measured)
-        return f(x_ideal)
+    return Resampler(x_ideal, method=method)(x_measured, y_measured)
+
+
+def monotone_branch(x_measured, y_measured):
+    """Return x_measured ascending without duplicates (keeping the last occurrence) and the matching y_measured.
+
+    Branches that are already strictly monotonic are returned as (reversed) views without sorting."""
+    x = np.asarray(x_measured, dtype=np.float64)
+    y = np.asarray(y_measured, dtype=np.float64)
+
+    step = np.diff(x)
+    if np.all(step > 0):
+        return x, y
+    if np.all(step < 0):
+        return x[::-1], y[::-1]
+
+    # np.unique returns the first occurrence, on the reversed branch that is the last one
+    _, last = np.unique(x[::-1], return_index=True)
+    order = len(x) - 1 - last
+    return x[order], y[order]
+
+
+class Resampler:
+    """Resampling of measured branches onto one fixed target grid.
+
+    The grid is sorted once, so resampling all cycles of a file (or all files of a series) onto the same
+    potentials only costs the interpolation itself. Linear resampling of many branches runs in one batch,
+    branches with fewer than 2 points can not be interpolated and resample to NaN."""
+
+    def __init__(self, x_ideal, method='interp1d'):
+        if method not in INTERPOLATION_METHODS:
+            raise Exception('Unimplemented Interpolation method "' + method + '". Implement in pylabhelper/math.py')
+
+        self.x_ideal = np.asarray(x_ideal, dtype=np.float64)
+        self.method = method
+
+        # the linear kernel searches the measured points in the ascending grid
+        self._grid_order = np.argsort(self.x_ideal, kind='stable')
+        self._sorted_grid = self.x_ideal[self._grid_order]
+
+    def __call__(self, x_measured, y_measured):
+        return self.resample_many([(x_measured, y_measured)])[0]
+
+    def resample_many(self, branches):
+        """Resample a list of (x_measured, y_measured) branches into one (branches x grid points) array."""
+        branches = [monotone_branch(x_measured, y_measured) for x_measured, y_measured in branches]
+        resampled = np.full((len(branches), len(self.x_ideal)), np.nan)
+
+        usable = np.array([len(x) >= 2 for x, _ in branches], dtype=bool)
+        if not usable.any():
+            return resampled
+
+        if self.method == 'interp1d':
+            sorted_rows = self._linear([branch for branch, ok in zip(branches, usable) if ok])
+            rows = np.empty_like(sorted_rows)
+            rows[:, self._grid_order] = sorted_rows
+            resampled[usable] = rows
+            return resampled
+
+        for row, (x, y), ok in zip(resampled, branches, usable):
+            if not ok:
+                continue
+            if self.method == 'CubicSpline':
+                row[:] = interp.CubicSpline(x, y, extrapolate=True)(self.x_ideal)
+            elif self.method == 'Akima1DInterpolator':
+                row[:] = interp.Akima1DInterpolator(x, y)(self.x_ideal)
+        return resampled
+
+    def _linear(self, branches):
+        # same arithmetic as interp1d(..., bounds_error=False, fill_value="extrapolate") on every ascending branch,
+        # evaluated on the sorted grid. np.searchsorted(x, grid, side='left') of a branch counts its points below
+        # every grid point, a point lies below all grid points from searchsorted(grid, point, side='right') on, so
+        # one search of all points in the grid and a cumulative count per branch give the positions of all branches
+        lengths = np.array([len(x) for x, _ in branches])
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        x = np.concatenate([x for x, _ in branches])
+        y = np.concatenate([y for _, y in branches])
+
+        grid = self._sorted_grid
+        slots = len(grid) + 1
+        first_above = np.searchsorted(grid, x, side='right')
+        branch = np.repeat(np.arange(len(branches)), lengths)
+        counts = np.bincount(branch * slots + first_above, minlength=len(branches) * slots)
+        below = np.cumsum(counts.reshape(len(branches), slots), axis=1)[:, :-1]
+
+        upper = np.clip(below, 1, lengths[:, None] - 1) + offsets[:, None]
+        lower = upper - 1
+        slope = (y[upper] - y[lower]) / (x[upper] - x[lower])
+        return slope * (grid - x[lower]) + y[lower]
+
+
+def least_squares(design, values):
+    """Solve design @ coefficients = values in the least squares sense for all columns of values at once.
+
+    design is (observations x parameters), values is (observations x problems). Returns the coefficients
+    (parameters x problems), their standard errors scaled by the residual variance like scipy's curve_fit,
+    the fitted values and R² for every problem."""
+    coefficients, _, _, _ = np.linalg.lstsq(design, values, rcond=None)
+    fitted = design @ coefficients
+
+    ss_res = np.sum((values - fitted) ** 2, axis=0)
+    ss_tot = np.sum((values - np.mean(values, axis=0)) ** 2, axis=0)
+
+    degrees_of_freedom = design.shape[0] - design.shape[1]
+    if degrees_of_freedom > 0:
+        covariance = np.linalg.pinv(design.T @ design)
+        errors = np.sqrt(np.outer(np.diag(covariance), ss_res / degrees_of_freedom))
     else:
-        raise Exception('Unimplemented Interpolation method "' + method +  '". Implement in pylabhelper/math.py')
\ No newline at end of file
+        # the covariance can not be estimated, curve_fit reports inf as well
+        errors = np.full(coefficients.shape, np.inf)
+
+    return coefficients, errors, fitted, 1 - (ss_res / ss_tot)
+
+
+def linear_regression(x, values):
+    """Fit values = intercept + slope * x for all columns of values at once in closed form.
+
+    x holds one entry per row of values. Returns intercept, slope and R² per column, R² follows
+    sklearn's score for constant values (1 for a perfect fit, 0 otherwise)."""
+    x = np.asarray(x, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    x_centered = x - np.mean(x)
+    values_mean = np.mean(values, axis=0)
+
+    slope = (x_centered @ (values - values_mean)) / np.sum(x_centered ** 2)
+    intercept = values_mean - slope * np.mean(x)
+
+    ss_res = np.sum((values - intercept - np.outer(x, slope)) ** 2, axis=0)
+    ss_tot = np.sum((values - values_mean) ** 2, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(ss_tot > 0, 1 - (ss_res / ss_tot), np.where(ss_res > 0, 0.0, 1.0))
+
+    return intercept, slope, r_squared
+
+
+def turning_points(values, hysteresis):
+    """Indices of the maxima and minima at which a trace reverses its direction by more than hysteresis.
+
+    A turning point is only accepted once the trace moved back from it by more than hysteresis, so noise
+    smaller than that never splits a scan and the start and end of the trace are no turning points.
+    From every turning point the next one is searched vectorized in a window behind it, the window grows
+    while the direction did not reverse, so the trace is scanned in linear time. Returns (maxima, minima)."""
+    values = np.asarray(values, dtype=np.float64)
+    turning = {True: [], False: []}
+
+    # the first excursion by more than hysteresis decides the initial direction
+    excursion, window = _first_reached(values, 0, 1024, lambda segment:
+                                       (segment > np.minimum.accumulate(segment) + hysteresis) |
+                                       (segment < np.maximum.accumulate(segment) - hysteresis))
+    if excursion is None:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    rising = values[excursion] > np.min(values[:excursion + 1]) + hysteresis
+    position = 0
+
+    while True:
+        sign = 1 if rising else -1
+        reversal, window = _first_reached(values, position, window, lambda segment:
+                                          sign * segment < np.maximum.accumulate(sign * segment) - hysteresis)
+        if reversal is None:
+            break
+
+        vertex = position + int(np.argmax(sign * values[position:reversal]))
+        turning[rising].append(vertex)
+
+        position = vertex
+        rising = not rising
+
+    return np.array(turning[True], dtype=np.int64), np.array(turning[False], dtype=np.int64)
+
+
+def _first_reached(values, start, window, condition):
+    # first index from start on at which condition (evaluated on values[start:stop]) holds, growing the window
+    # while it does not, returns the index (or None) and a window size for the next search
+    while True:
+        stop = min(start + window, len(values))
+        reached = np.flatnonzero(condition(values[start:stop]))
+
+        if len(reached):
+            return start + int(reached[0]), max(1024, 2 * int(reached[0]))
+        if stop == len(values):
+            return None, window
+        window *= 2
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas
+import re
+
+# EC-Lab writes its exports in the Windows codepage, latin-1 decodes every byte of it
+ENCODING = 'latin-1'
+
+
+def readline(file):
+    # decode a single line of a binary file handle, normalizing the line ending to '\n'
+    line = file.readline().decode(ENCODING)
+    if line.endswith('\r\n'):
+        line = line[:-2] + '\n'
+    return line
+
+
+def read_header_lines(file):
+    """Read the header block of an .mpt file opened in binary mode.
+
+    The file is left positioned at the first data row, the column names are the last returned line."""
+    lines = [readline(file)]
+
+    # check if ASCII file
+    if "EC-Lab ASCII FILE" not in lines[0]:
+        raise Exception('Only EC-Lab ASCII Files supported')
+
+    lines.append(readline(file))
+
+    # extract number of header lines from file
+    header_lines = int(re.findall('Nb header lines : ([0-9]+)', lines[1])[0])
+
+    for _ in range(header_lines - 2):
+        lines.append(readline(file))
+
+    return lines
+
+
+def column_names(header_lines):
+    # the column line ends with a trailing tab
+    return header_lines[-1].split('\t')[:-1]
+
+
+def read_data(file, columns, **kwargs):
+    """Decode the tab separated data block of an .mpt file straight into float64 columns.
+
+    The C tokenizer of pandas handles the decimal comma while scanning the bytes, so no
+    intermediate string objects are created."""
+    return pandas.read_csv(file,
+                           sep='\t',
+                           decimal=',',
+                           header=None,
+                           names=columns,
+                           index_col=False,
+                           dtype=np.float64,
+                           encoding=ENCODING,
+                           **kwargs)
+
+
+# Storage of the known counter and flag columns of EC-Lab exports (as named in BiologicFile.data),
+# every other column is a measured signal
+COLUMN_KINDS = {
+    'mode': ('counter', np.int8),
+    'ox/red': ('flag', np.bool_),
+    'error': ('flag', np.bool_),
+    'control_changes': ('flag', np.bool_),
+    'Ns_changes': ('flag', np.bool_),
+    'counter_inc.': ('flag', np.bool_),
+    'Ns': ('counter', np.int16),
+    'cycle_number': ('counter', np.int32),
+    'half_cycle': ('counter', np.int32),
+    'z_cycle': ('counter', np.int32),
+}
+
+# signals that keep float64 even with float32=True, the time of week long runs needs the precision
+FLOAT64_SIGNALS = ['time/s']
+
+
+def compact(data, float32=False):
+    """Store counters and flags of parsed float64 data in small integer and bool columns.
+
+    A column is only converted if all its values are representable, otherwise it stays float64.
+    With float32=True the measured signals (except FLOAT64_SIGNALS) are stored as float32."""
+    conversions = {}
+    for column in data.columns:
+        values = data[column].to_numpy()
+        kind, dtype = COLUMN_KINDS.get(column, ('signal', np.float32 if float32 else np.float64))
+
+        if kind == 'signal':
+            if column not in FLOAT64_SIGNALS and dtype != values.dtype:
+                conversions[column] = dtype
+            continue
+
+        if kind == 'flag':
+            representable = np.isin(values, [0, 1]).all()
+        else:
+            limits = np.iinfo(dtype)
+            representable = np.all((values == np.round(values)) & (values >= limits.min) & (values <= limits.max))
+
+        if representable:
+            conversions[column] = dtype
+
+    return data.astype(conversions) if conversions else data
+
+
+def schema(data):
+    """Describe kind (counter, flag or signal) and storage dtype of every column of data."""
+    return {column: {'kind': COLUMN_KINDS.get(column, ('signal', None))[0], 'dtype': str(data[column].dtype)}
+            for column in data.columns}
+
+
+def file_type(header_lines):
+    # line 3 names the technique, RRDE files carry an additional disk channel block there
+    if len(header_lines[4]) > 1 and header_lines[3][:-1] == 'DISK CHANNEL SETTING':
+        return 'RRDE'
+    return header_lines[3][:-1]
+
+
+def scan_header(header_lines):
+    """Extract the metadata of a header block that is needed to select and sort measurements.
+
+    Every value that is not present in the header (e.g. vertices of a charge discharge file) is None."""
+
+    def value(keyword):
+        matching = [line for line in header_lines if keyword in line]
+        if not matching:
+            return None
+        return _to_float(re.findall('([\\-0-9]+[,\\.][0-9]+)', matching[0]))
+
+    def technique_row(name):
+        # technique parameters are laid out in columns of 20 characters, one column per sequence
+        matching = [line[:-1] for line in header_lines if line.startswith(name + ' ')]
+        if not matching:
+            return []
+        return [matching[0][index:index + 20].strip() for index in range(20, len(matching[0]), 20)]
+
+    acquisition = [line for line in header_lines if 'Acquisition started on' in line]
+    control_currents = [_to_float([cell]) for cell in technique_row('ctrl1_val')]
+
+    return {
+        'file_type': file_type(header_lines),
+        'header_lines': len(header_lines),
+        'acquisition_started': acquisition[0].split(' : ', 1)[1][:-1] if acquisition else None,
+        'speed': value('dE/dt'),
+        'start_vertice': value('Ei (V)'),
+        'first_vertice': value('E1 (V)'),
+        'second_vertice': value('E2 (V)'),
+        'final_vertice': value('Ef (V)'),
+        'control_currents': [current for current in control_currents if current is not None],
+        'control_current_unit': next(iter(technique_row('ctrl1_val_unit')), None),
+    }
+
+
+def _to_float(matches):
+    try:
+        return float(matches[0].replace(',', '.'))
+    except (IndexError, ValueError):
+        return None
@@ -0,0 +1,146 @@
+import json
+import os
+import re
+import sqlite3
+
+import pylabhelper.mpt as mpt
+
+DEFAULT_DATABASE = os.path.join(os.path.expanduser('~'), '.cache', 'pylabhelper', 'mpt-index.sqlite')
+
+# EC-Lab names exports <sample>_<sequence>_<technique>_C<channel>.mpt
+FILE_NAME_PATTERN = re.compile(r'^(?P<sample>.*)_(?P<sequence>[0-9]+)_(?P<technique>[^_]+)_C(?P<channel>[0-9]+)\.mpt$')
+
+COLUMNS = ['path', 'directory', 'file_name', 'size', 'mtime_ns',
+           'sample', 'sequence', 'technique', 'channel',
+           'file_type', 'header_lines', 'acquisition_started', 'speed',
+           'start_vertice', 'first_vertice', 'second_vertice', 'final_vertice',
+           'control_current', 'control_current_unit', 'control_currents']
+
+
+class MeasurementIndex:
+    """Persistent index of the header metadata of all mpt files in measurement directories.
+
+    Only the header block of a file is read, and only if the file is new or its size or mtime changed, so
+    selecting e.g. all Modulo Bat files of a sample sorted by current is a query instead of a full parse:
+
+        index = MeasurementIndex()
+        index.update('//share/measurements')
+        index.select(technique='MB', sample='BeKo0001%', order_by='control_current')
+    """
+
+    def __init__(self, database=DEFAULT_DATABASE):
+        if database != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+
+        self._connection = sqlite3.connect(database)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute(f"CREATE TABLE IF NOT EXISTS measurements "
+                                 f"({', '.join(COLUMNS)}, PRIMARY KEY (path))")
+
+    def update(self, directory, recursive=True):
+        """Index new and changed mpt files below directory and forget deleted ones. Returns the number of files read."""
+        directory = os.path.abspath(directory)
+
+        # without recursion the files of subdirectories are neither scanned nor forgotten
+        if recursive:
+            condition = "directory = ? OR directory LIKE ? ESCAPE '!'"
+            parameters = (directory, _like_escape(os.path.join(directory, '')) + '%')
+        else:
+            condition = "directory = ?"
+            parameters = (directory,)
+
+        known = {row['path']: (row['size'], row['mtime_ns']) for row in self._connection.execute(
+            f"SELECT path, size, mtime_ns FROM measurements WHERE {condition}", parameters)}
+
+        found = set()
+        read = 0
+        for path in self._mpt_files(directory, recursive):
+            stat = os.stat(path)
+            found.add(path)
+
+            if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                continue
+
+            try:
+                with open(path, 'rb') as file:
+                    header = mpt.scan_header(mpt.read_header_lines(file))
+            except Exception:
+                # not an EC-Lab ASCII file (or unreadable), leave it out of the index
+                continue
+
+            self._store(path, stat, header)
+            read += 1
+
+        vanished = [(path,) for path in known if path not in found]
+        self._connection.executemany("DELETE FROM measurements WHERE path = ?", vanished)
+        self._connection.commit()
+
+        return read
+
+    def select(self, file_type=None, technique=None, sample=None, order_by='path', **equal):
+        """List the indexed measurements as dicts.
+
+        sample is a LIKE pattern (use % as wildcard), every other argument has to match exactly,
+        order_by is one of the index columns."""
+        if order_by not in COLUMNS:
+            raise Exception(f"Can not order by '{order_by}', use one of {COLUMNS}")
+
+        conditions = []
+        parameters = []
+        for column, value in dict(equal, file_type=file_type, technique=technique).items():
+            if column not in COLUMNS:
+                raise Exception(f"Unknown column '{column}'")
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+
+        if sample is not None:
+            conditions.append("sample LIKE ?")
+            parameters.append(sample)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._connection.execute(f"SELECT * FROM measurements {where} ORDER BY {order_by}", parameters)
+
+        return [dict(row, control_currents=json.loads(row['control_currents'])) for row in rows]
+
+    def close(self):
+        self._connection.close()
+
+    def _store(self, path, stat, header):
+        name = FILE_NAME_PATTERN.match(os.path.basename(path))
+        control_currents = header.pop('control_currents')
+
+        row = dict(header,
+                   path=path,
+                   directory=os.path.dirname(path),
+                   file_name=os.path.basename(path),
+                   size=stat.st_size,
+                   mtime_ns=stat.st_mtime_ns,
+                   sample=name['sample'] if name else None,
+                   sequence=int(name['sequence']) if name else None,
+                   technique=name['technique'] if name else None,
+                   channel=int(name['channel']) if name else None,
+                   control_current=control_currents[0] if control_currents else None,
+                   control_currents=json.dumps(control_currents))
+
+        self._connection.execute(f"INSERT OR REPLACE INTO measurements ({', '.join(COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                                 [row[column] for column in COLUMNS])
+
+    @staticmethod
+    def _mpt_files(directory, recursive):
+        if not recursive:
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.lower().endswith('.mpt'):
+                    yield entry.path
+            return
+
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                if file_name.lower().endswith('.mpt'):
+                    yield os.path.join(root, file_name)
+
+
+def _like_escape(text):
+    # % and _ are wildcards of LIKE (and common in sample names), ! is the escape character of the patterns
+    return re.sub(r'([!%_])', r'!\1', text)
@@ -0,0 +1,18 @@
+# The timing tests (those using the pytest-benchmark fixture) only run on request:
+#
+#   pytest tests --benchmark-only      the timings only
+#   pytest tests --benchmark-enable    the timings and all other tests
+#
+# A plain pytest run skips them and keeps the golden and legacy checks of tests/test_benchmarks.py.
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('benchmark_only', False) or config.getoption('benchmark_enable', False):
+        return
+
+    skip = pytest.mark.skip(reason='timing run, pass --benchmark-only or --benchmark-enable')
+    for item in items:
+        if 'benchmark' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip)
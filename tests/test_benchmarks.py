@@ -0,0 +1,80 @@
+# The stages of benchmarks.suite as pytest-benchmark tests, and their outputs against the golden snapshots that
+# benchmarks.golden computed with the original implementations.
+#
+# A plain pytest run only runs the checks, the timings are skipped unless asked for (see tests/conftest.py):
+# pytest tests/test_benchmarks.py --benchmark-only runs the timings only, --benchmark-enable both.
+
+import pytest
+
+from benchmarks import golden, suite
+from benchmarks.load_mpt import measure
+from pylabhelper import biologic
+from pylabhelper import cache as parse_cache
+from pylabhelper.CV import CV
+from pylabhelper.CVSeries import CVSeries
+
+pytest.importorskip('pytest_benchmark')
+
+ROUNDS = 5
+
+
+@pytest.fixture(autouse=True)
+def no_parse_cache(monkeypatch):
+    # every round has to parse the file again
+    monkeypatch.setattr(parse_cache, 'enabled', False)
+
+
+@pytest.fixture(scope='module', params=golden.SIZES)
+def paths(request, tmp_path_factory):
+    return request.param, golden.write_files(str(tmp_path_factory.mktemp(f"cycles_{request.param}")), request.param)
+
+
+def loaded_mb(path, stages):
+    """Setup of benchmark.pedantic, a freshly loaded Modulo Bat file with the given MB_STAGES applied."""
+    mb = biologic.load_mpt(path)
+    for _, function in suite.MB_STAGES[:stages]:
+        function(mb)
+    return (mb,), {}
+
+
+def run(benchmark, function, setup=None):
+    # peak memory of one extra run, pytest-benchmark only measures the time
+    arguments, _ = setup() if setup else ((), {})
+    benchmark.extra_info['peak_mib'] = measure(function, *arguments)[2] / 2**20
+    return benchmark.pedantic(function, setup=setup, rounds=ROUNDS)
+
+
+def test_mb_load_mpt(benchmark, paths):
+    run(benchmark, lambda: biologic.load_mpt(paths[1]['mb']))
+
+
+@pytest.mark.parametrize('stage', range(len(suite.MB_STAGES)), ids=[name for name, _ in suite.MB_STAGES])
+def test_mb_stage(benchmark, paths, stage):
+    run(benchmark, suite.MB_STAGES[stage][1], lambda: loaded_mb(paths[1]['mb'], stage))
+
+
+def test_cv_load(benchmark, paths):
+    run(benchmark, lambda: CV(paths[1]['cv'][0]).interp_data)
+
+
+def test_cv_series(benchmark, paths):
+    run(benchmark, lambda: CVSeries(paths[1]['cv'], workers=1))
+
+
+def test_rrde_load_mpt(benchmark, paths):
+    run(benchmark, lambda: biologic.load_mpt(paths[1]['rrde']))
+
+
+def test_golden(paths):
+    cycles, files = paths
+    _, analysed = suite.run_stages(files)
+    failed = [name for name, passed in suite.compare(suite.outputs(analysed), golden.load(cycles)) if not passed]
+    assert failed == []
+
+
+def test_legacy(paths):
+    _, files = paths
+    _, analysed = suite.run_stages(files)
+    # the quadratic legacy resolution_crop is covered by the golden snapshots
+    failed = [name for name, passed in suite.reference_checks(files, analysed, legacy_limit=0) if not passed]
+    assert failed == []
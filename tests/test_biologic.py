@@ -0,0 +1,66 @@
+# Files processed in the load_mpt_many workers have to arrive as if they were processed in this process.
+
+import pickle
+
+import numpy as np
+import pandas
+
+from benchmarks import export, fake_originpro, legacy, synthetic
+from pylabhelper import biologic, engine
+from pylabhelper.BiologicFile import BiologicFile
+
+
+def test_load_mpt_many_workers_rebuild_the_cycle_views(tmp_path):
+    paths = {}
+    for cycles in [3, 4]:
+        paths[cycles] = str(tmp_path / f"sample_{cycles:02d}_MB_C01.mpt")
+        synthetic.modulo_bat(paths[cycles], cycles=cycles)
+
+    files = biologic.load_mpt_many(paths, workers=2, pipeline=engine.PIPELINES['cd'], cache=False)
+
+    for name, path in paths.items():
+        expected = biologic._load_mpt_with_pipeline(path, engine.PIPELINES['cd'], False)
+        for views, data in [('cycles', '_cycle_data'), ('half_cycles', '_half_cycle_data')]:
+            assert len(getattr(files[name], views)) == len(getattr(expected, views))
+            for view, expected_view in zip(getattr(files[name], views), getattr(expected, views)):
+                pandas.testing.assert_frame_equal(view, expected_view)
+                # a view on the unpickled data, not a copy of its own
+                assert np.shares_memory(view['Ewe-Ece/V'].to_numpy(),
+                                        getattr(files[name], data)['Ewe-Ece/V'].to_numpy())
+
+
+def test_pickled_file_does_not_carry_copies_of_the_cycles(tmp_path):
+    path = str(tmp_path / 'sample_01_MB_C01.mpt')
+    synthetic.modulo_bat(path, cycles=20)
+    mpt_file = biologic._load_mpt_with_pipeline(path, engine.PIPELINES['cd'], False)
+
+    with_views = len(pickle.dumps(mpt_file.__dict__))
+    assert len(pickle.dumps(mpt_file)) < with_views - len(pickle.dumps(mpt_file.cycles))
+
+
+def test_default_load_keeps_the_parsed_columns(tmp_path):
+    path = str(tmp_path / 'sample_01_MB_C01.mpt')
+    synthetic.modulo_bat(path, cycles=3)
+
+    data = BiologicFile(path, cache=False).data
+    assert (data.dtypes == np.float64).all()
+    pandas.testing.assert_frame_equal(data, legacy.load_mpt_data(path), check_dtype=False)
+
+
+def test_compact_load_exports_the_same_sheets(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sample_01_MB_C01.mpt')
+    synthetic.modulo_bat(path, cycles=3)
+    monkeypatch.setattr(biologic, 'op', fake_originpro)
+
+    books = []
+    for compact in [False, True]:
+        mpt_file = biologic.load_mpt(path, cache=False, compact=compact)
+        mpt_file.resolution_crop(delta_time=10, delta_pot=0.01)
+        mpt_file.extract_cycles()
+        mpt_file.calculate_charge_discharge_capacitances()
+
+        fake_originpro.reset()
+        biologic.op_mb_charge_discharge_data_to_workbook(mpt_file, 'Cycles', 'sample')
+        books.append(export.sheet_contents(fake_originpro.books[0]))
+
+    assert export.same_contents(*books)
@@ -0,0 +1,64 @@
+# The pipeline applied to the chunks of iter_chunks has to give the results of the same pipeline on the whole file.
+
+import pandas
+import pytest
+
+from benchmarks import synthetic
+from pylabhelper.BiologicFile import BiologicFile
+
+PIPELINE = [
+    ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+    ('shift_time_to_zero', {}),
+    ('shift_cycles', {}),
+    ('extract_cycles', {}),
+    ('calculate_charge_discharge_capacitances', {}),
+]
+
+
+def apply(mpt_file, pipeline):
+    for method, kwargs in pipeline:
+        getattr(mpt_file, method)(**kwargs)
+    return mpt_file
+
+
+@pytest.fixture(scope='module')
+def path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('chunks') / 'sample_01_MB_C01.mpt')
+    synthetic.modulo_bat(path, cycles=6)
+    return path
+
+
+@pytest.mark.parametrize('chunksize', [150, 400, 1000])
+def test_cycle_chunks_match_full_load(path, chunksize):
+    full = apply(BiologicFile(path, cache=False), PIPELINE)
+    chunks = [apply(chunk, PIPELINE) for chunk in BiologicFile.iter_chunks(path, chunksize=chunksize,
+                                                                            by='cycle_number')]
+
+    assert len(chunks) == len(full.cycle_numbers)
+    for table in ['data', 'data_cropped', 'capacitances']:
+        pandas.testing.assert_frame_equal(pandas.concat([getattr(chunk, table) for chunk in chunks]),
+                                          getattr(full, table), obj=table)
+
+    for views in ['cycles', 'half_cycles']:
+        chunk_views = [view for chunk in chunks for view in getattr(chunk, views)]
+        assert len(chunk_views) == len(getattr(full, views))
+        for chunk_view, full_view in zip(chunk_views, getattr(full, views)):
+            pandas.testing.assert_frame_equal(chunk_view, full_view, obj=views)
+
+
+def test_fixed_chunks_match_full_load(path):
+    # without by the cycles run over the chunk boundaries, the rows still have to match
+    pipeline = PIPELINE[:3]
+    full = apply(BiologicFile(path, cache=False), pipeline)
+    chunks = [apply(chunk, pipeline) for chunk in BiologicFile.iter_chunks(path, chunksize=333)]
+
+    for table in ['data', 'data_cropped']:
+        pandas.testing.assert_frame_equal(pandas.concat([getattr(chunk, table) for chunk in chunks]),
+                                          getattr(full, table), obj=table)
+
+
+def test_by_column_is_read_for_the_split_only(path):
+    chunks = list(BiologicFile.iter_chunks(path, by='cycle_number', usecols=['time/s']))
+
+    assert len(chunks) == 6
+    assert all(list(chunk.data.columns) == ['time/s'] for chunk in chunks)
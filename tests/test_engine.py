@@ -0,0 +1,41 @@
+# A result directory written by engine.save() has to load back as the processed file, tables and indices alike.
+
+import pandas
+import pytest
+
+from benchmarks import synthetic
+from pylabhelper import biologic, engine
+
+
+@pytest.mark.parametrize('pipeline', sorted(engine.PIPELINES))
+def test_save_load_round_trip(tmp_path, pipeline):
+    path = str(tmp_path / 'sample_01_MB_C01.mpt')
+    synthetic.modulo_bat(path, cycles=5)
+
+    processed = biologic._load_mpt_with_pipeline(path, engine.PIPELINES[pipeline], False)
+    engine.save(processed, str(tmp_path / 'result'))
+    loaded = engine.load(str(tmp_path / 'result'))
+
+    for table in engine.TABLES:
+        if getattr(processed, table) is None:
+            assert getattr(loaded, table) is None
+        else:
+            # the loaded columns are memory mapped, the copy compares them as plain arrays
+            pandas.testing.assert_frame_equal(getattr(loaded, table).copy(), getattr(processed, table), obj=table)
+
+    assert loaded.cycle_numbers == processed.cycle_numbers
+    assert loaded.half_cycle_numbers == processed.half_cycle_numbers
+    for views in ['cycles', 'half_cycles']:
+        loaded_views = getattr(loaded, views) or []
+        processed_views = getattr(processed, views) or []
+        assert len(loaded_views) == len(processed_views)
+        for loaded_view, processed_view in zip(loaded_views, processed_views):
+            pandas.testing.assert_frame_equal(loaded_view.copy(), processed_view, obj=views)
+
+    assert loaded.header.keys() == processed.header.keys()
+    for key, value in processed.header.items():
+        if isinstance(value, pandas.DataFrame):
+            pandas.testing.assert_frame_equal(loaded.header[key], value, obj=key)
+        else:
+            assert loaded.header[key] == value
+    assert loaded.history == processed.history
@@ -0,0 +1,43 @@
+# The Origin exporters against the originpro stand-in of benchmarks/fake_originpro.py.
+
+import numpy as np
+import pytest
+
+from benchmarks import export, fake_originpro
+from pylabhelper import biologic
+
+
+@pytest.fixture
+def origin(monkeypatch):
+    monkeypatch.setattr(biologic, 'op', fake_originpro)
+    fake_originpro.reset()
+    return fake_originpro
+
+
+@pytest.mark.parametrize('layer', [2, '2 layers'])
+def test_capacitances_workbook_repeats_the_layer(origin, layer):
+    mb = export.synthetic_modulo_bat(cycles=4, points=50)
+    biologic.op_capacitances_workbook([mb, mb], 'Capacitances', 'sample', layer)
+
+    sheet = origin.books[0].sheets[1]
+    _, values, long_name, units, _, designation = sheet.content()[1]
+    assert list(values) == [layer] * 2 * len(mb.capacitances)
+    assert (long_name, units, designation) == ('Current', 'mA', 'N')
+    np.testing.assert_array_equal(sheet.content()[0][1], np.tile(mb.capacitances['Cycle Number'].to_numpy(), 2))
+
+
+def test_long_layout_plots_every_cycle_over_its_rows(origin):
+    mb = export.synthetic_modulo_bat(cycles=4, points=50)
+    biologic.op_mb_charge_discharge_data_to_workbook(mb, 'Cycles', 'sample', 'long')
+
+    cycle_column = origin.books[0].sheets[2].content()[0][1]
+    plots = origin.graphs[-1][0].plots
+    assert len(plots) == len(mb.cycle_numbers)
+
+    first_row = 1
+    for plot, cycle_number in zip(plots, mb.cycle_numbers):
+        last_row = first_row + len(mb.get_cycle(cycle_number)) - 1
+        assert plot.commands == [f"-b {first_row}", f"-e {last_row}"]
+        assert set(cycle_column[first_row - 1:last_row]) == {cycle_number}
+        first_row = last_row + 1
+    assert first_row - 1 == len(cycle_column)
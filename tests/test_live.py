@@ -0,0 +1,80 @@
+# Polling a growing file has to give the same tables as loading the finished file in one go.
+
+import re
+
+import numpy as np
+import pandas
+import pytest
+
+from benchmarks import synthetic
+from pylabhelper.BiologicFile import BiologicFile
+
+POINTS_PER_HALF_CYCLE = 200
+
+PIPELINE = [
+    ('resolution_crop', {'delta_time': 10, 'delta_pot': 0.01}),
+    ('shift_time_to_zero', {}),
+    ('shift_cycles', {}),
+    ('extract_cycles', {}),
+    ('calculate_charge_discharge_capacitances', {}),
+]
+
+# rows per poll, most boundaries fall on half cycle edges (every POINTS_PER_HALF_CYCLE rows)
+CHUNKS = [POINTS_PER_HALF_CYCLE, 1, POINTS_PER_HALF_CYCLE - 1, POINTS_PER_HALF_CYCLE, 2 * POINTS_PER_HALF_CYCLE,
+          57, POINTS_PER_HALF_CYCLE - 57]
+
+
+def split_rows(path):
+    with open(path, 'rb') as file:
+        contents = file.read()
+    header_lines = int(re.findall(rb'Nb header lines : ([0-9]+)', contents)[0])
+    lines = contents.splitlines(keepends=True)
+    return b''.join(lines[:header_lines]), lines[header_lines:]
+
+
+def apply(mpt_file):
+    for method, kwargs in PIPELINE:
+        getattr(mpt_file, method)(**kwargs)
+    return mpt_file
+
+
+def assert_same(live, full):
+    for table in ['data', 'data_cropped', '_cycle_data', '_half_cycle_data']:
+        pandas.testing.assert_frame_equal(getattr(live, table), getattr(full, table),
+                                          check_dtype=False, check_index_type=False, obj=table)
+
+    assert live.cycle_numbers == full.cycle_numbers
+    assert live.half_cycle_numbers == full.half_cycle_numbers
+    for segments in ['_cycle_segments', '_half_cycle_segments']:
+        np.testing.assert_array_equal(getattr(live, segments).starts, getattr(full, segments).starts)
+        np.testing.assert_array_equal(getattr(live, segments).stops, getattr(full, segments).stops)
+
+    pandas.testing.assert_frame_equal(live.capacitances.sort_index(), full.capacitances.sort_index(),
+                                      check_dtype=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('initial_rows', [0, 1, POINTS_PER_HALF_CYCLE])
+def test_poll_matches_full_load(tmp_path, initial_rows):
+    full_path = str(tmp_path / 'full_MB_C01.mpt')
+    synthetic.modulo_bat(full_path, cycles=6, points_per_half_cycle=POINTS_PER_HALF_CYCLE)
+    full = apply(BiologicFile(full_path, cache=False))
+
+    header, rows = split_rows(full_path)
+    live_path = str(tmp_path / 'live_MB_C01.mpt')
+    with open(live_path, 'wb') as file:
+        file.write(header + b''.join(rows[:initial_rows]))
+
+    # the pipeline runs on a file without (or with a single) data row and is carried on by poll()
+    live = apply(BiologicFile.live(live_path))
+
+    position = initial_rows
+    chunk = 0
+    while position < len(rows):
+        size = CHUNKS[chunk % len(CHUNKS)]
+        with open(live_path, 'ab') as file:
+            file.write(b''.join(rows[position:position + size]))
+        assert live.poll() == len(rows[position:position + size])
+        position += size
+        chunk += 1
+
+    assert_same(live, full)
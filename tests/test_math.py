@@ -0,0 +1,33 @@
+# The batched linear resampling has to give interp1d's values for every branch of a batch.
+
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import pylabhelper.math as lm
+
+
+@pytest.mark.parametrize('grid', [np.linspace(-1, 1, 201), np.linspace(1, -1, 201)])
+def test_resample_many_matches_interp1d(grid):
+    rng = np.random.default_rng(0)
+    branches = [(rng.uniform(-1.2, 1.2, points), rng.normal(size=points)) for points in [2, 3, 40, 500]]
+    # falling, with duplicates and on grid points
+    branches.append((np.linspace(0.5, -0.5, 30), rng.normal(size=30)))
+    branches.append((np.round(rng.uniform(-1, 1, 300), 2), rng.normal(size=300)))
+    branches.append((grid[10:60].copy(), rng.normal(size=50)))
+
+    resampled = lm.Resampler(grid).resample_many(branches)
+
+    for row, (x_measured, y_measured) in zip(resampled, branches):
+        x, y = lm.monotone_branch(x_measured, y_measured)
+        np.testing.assert_allclose(row, interp1d(x, y, fill_value='extrapolate')(grid), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('method', lm.INTERPOLATION_METHODS)
+def test_branches_with_fewer_than_two_points_resample_to_nan(method):
+    grid = np.linspace(0, 1, 5)
+    resampled = lm.Resampler(grid, method=method).resample_many([([0.5], [1.0]), ([], []),
+                                                                  ([0, 0.3, 0.6, 1], [0, 1, 2, 3])])
+
+    assert np.isnan(resampled[:2]).all()
+    assert np.isfinite(resampled[2]).all()
@@ -0,0 +1,36 @@
+# An update of one directory must not forget the files indexed from other directories.
+
+import os
+
+from benchmarks import synthetic
+from pylabhelper.mptindex import MeasurementIndex
+
+
+def write(directory, name):
+    os.makedirs(directory, exist_ok=True)
+    synthetic.open_circuit_voltage(os.path.join(directory, name), rows=10)
+
+
+def indexed(index):
+    return sorted(os.path.basename(row['path']) for row in index.select())
+
+
+def test_update_without_recursion_keeps_subdirectories(tmp_path):
+    write(str(tmp_path), 'top_01_OCV_C01.mpt')
+    write(str(tmp_path / 'sub'), 'sub_01_OCV_C01.mpt')
+
+    index = MeasurementIndex(':memory:')
+    assert index.update(str(tmp_path)) == 2
+    assert index.update(str(tmp_path), recursive=False) == 0
+    assert indexed(index) == ['sub_01_OCV_C01.mpt', 'top_01_OCV_C01.mpt']
+
+
+def test_update_does_not_match_wildcards_in_the_directory(tmp_path):
+    # without escaping, the _ of sample_1 matches the a of samplea1
+    write(str(tmp_path / 'sample_1'), 'one_01_OCV_C01.mpt')
+    write(str(tmp_path / 'samplea1' / 'sub'), 'other_01_OCV_C01.mpt')
+
+    index = MeasurementIndex(':memory:')
+    index.update(str(tmp_path))
+    index.update(str(tmp_path / 'sample_1'))
+    assert indexed(index) == ['one_01_OCV_C01.mpt', 'other_01_OCV_C01.mpt']